@@ -0,0 +1,234 @@
+"""
+Benchmarks for the EssentialAuth and PhraseMetrics hot paths.
+
+Usage::
+
+    python benchmarks/benchmark.py --sizes 1000 100000 1000000 --output results.json
+    python benchmarks/benchmark.py --sizes 1000 --compare results.json
+
+Each operation reports ops/sec and p50/p99 latency, every profile count also reports the size of the
+database on disk. Results are written as JSON so runs can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from essential_auth import EssentialAuth, PhraseMetrics, PhrasePolicy, SQLiteStorage
+from essential_auth.essentialauth import PBKDF2Hash, EssentialTropicsStorage
+
+stores = {'tropics': EssentialTropicsStorage, 'sqlite': SQLiteStorage}
+
+
+def make_users(count=1, offset=0, pool_size=1000):
+    """
+    Same template as the test fixtures - a pool of generated documents is reused so seeding a
+    million users does not spend its time in the generator, _id and login are made unique here.
+    """
+    from essential_generators import DocumentGenerator
+    template = {
+        'fname': 'word',
+        'mname': 'word',
+        'lname': 'word',
+        'email': 'email',
+        'dob': 'large_int',
+        'tags': ['admin', 'buildteam', 'dev', 'mgr'],
+        'desc': 'sentence'
+    }
+
+    gen = DocumentGenerator()
+    gen.set_template(template)
+    pool = gen.documents(min(count, pool_size))
+    for i in range(offset, offset + count):
+        profile = dict(pool[i % len(pool)])
+        profile['_id'] = 'user-%d' % i
+        profile['login'] = 'user-%d@example.com' % i
+        yield profile
+
+
+def timed(func, args_list):
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(name, size, latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'name': name,
+        'size': size,
+        'ops': len(latencies),
+        'ops_per_sec': len(latencies) / total if total else None,
+        'p50': latencies[int(len(latencies) * .5)],
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * .99))]
+    }
+
+
+def bench_auth(size, ops, directory, store_class=EssentialTropicsStorage):
+    db_location = os.path.join(directory, 'benchmark-%d.db' % size)
+    auth = EssentialAuth({'db_location': db_location, 'session_idle_timeout': 3600,
+                          'session_absolute_timeout': 7200}, store_class=store_class)
+    results = []
+
+    # seed in one bulk call - that is the add_profiles measurement
+    profiles = list(make_users(size))
+    start = time.perf_counter()
+    auth.add_profiles(profiles)
+    elapsed = time.perf_counter() - start
+    results.append({'name': 'add_profiles', 'size': size, 'ops': size, 'ops_per_sec': size / elapsed,
+                    'p50': elapsed / size, 'p99': elapsed / size})
+    # SQLite keeps recent writes in its -wal file
+    size_on_disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                       if name.startswith(os.path.basename(db_location)))
+    results.append({'name': 'file_size', 'size': size, 'bytes': size_on_disk})
+
+    new_profiles = [(profile,) for profile in make_users(ops, offset=size)]
+    results.append(summarize('add_profile', size, timed(auth.add_profile, new_profiles)))
+
+    logins = [profile['login'] for (profile,) in new_profiles]
+    results.append(summarize('set_passphrase', size,
+                             timed(auth.set_passphrase, [(login, 'purple') for login in logins])))
+
+    tokens = []
+    results.append(summarize('start_session', size,
+                             timed(lambda login: tokens.append(auth.start_session(login, 'purple')),
+                                   [(login,) for login in logins])))
+
+    validations = [(random.choice(tokens),) for i in range(ops * 10)]
+    results.append(summarize('validate_session', size, timed(auth.validate_session, validations)))
+    results.append(summarize('end_session', size, timed(auth.end_session, [(token,) for token in tokens])))
+
+    auth.close()
+
+    # opening an existing database reads it and must not write it back
+    modified = os.stat(db_location).st_mtime_ns
+    latencies = timed(lambda: EssentialAuth({'db_location': db_location}, store_class=store_class), [()] * 3)
+    results.append(summarize('open', size, latencies))
+    if os.stat(db_location).st_mtime_ns != modified:
+        print("warning: opening %s rewrote it" % db_location)
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    return results
+
+
+def bench_import(runs=5):
+    """
+    Cold 'import essential_auth' in fresh interpreters, less the interpreter's own startup.
+    """
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+    def run(statement):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement], cwd=root)
+        return time.perf_counter() - start
+
+    baseline = min(run('pass') for i in range(runs))
+    latencies = [max(0.0, run('import essential_auth') - baseline) for i in range(runs)]
+    return [summarize('import essential_auth', None, latencies)]
+
+
+def bench_metrics(ops):
+    phrases = [(phrase,) for phrase in ["}R-!6GbD", "password123", "aaaBBB1!", "correct horse battery staple",
+                                        "Tr0ub4dor&3", "qwertyuiop", "2uPI`Y"]] * max(1, ops // 7)
+    metrics = [(PhraseMetrics.metrics(phrase),) for (phrase,) in phrases]
+    results = [
+        summarize('PhraseMetrics.metrics', None, timed(PhraseMetrics.metrics, phrases)),
+        summarize('PhraseMetrics.rules', None, timed(PhraseMetrics.rules, metrics))
+    ]
+
+    start = time.perf_counter()
+    for _ in PhraseMetrics.metrics_many(phrase for (phrase,) in phrases):
+        pass
+    elapsed = time.perf_counter() - start
+    results.append({'name': 'PhraseMetrics.metrics_many', 'size': None, 'ops': len(phrases),
+                    'ops_per_sec': len(phrases) / elapsed, 'p50': elapsed / len(phrases),
+                    'p99': elapsed / len(phrases)})
+    return results
+
+
+def bench_policy(ops):
+    """
+    The policy runs before every set_passphrase hash - it should cost a small fraction of it.
+    """
+    phrases = [(phrase,) for phrase in ["abc", "password", "Password1!", "}R-!6GbD&x2q", "Tr0ub4dor&3x"]] * max(1, ops // 5)
+    policy = PhrasePolicy().prepare()
+    fail_fast = PhrasePolicy(fail_fast=True).prepare()
+    hasher = PBKDF2Hash()
+    return [
+        summarize('PhrasePolicy.check', None, timed(policy.check, phrases)),
+        summarize('PhrasePolicy.check fail_fast', None, timed(fail_fast.check, phrases)),
+        summarize('PBKDF2Hash.hash', None, timed(hasher.hash, phrases[:max(5, ops // 10)]))
+    ]
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(result['name'], result['size']): result for result in baseline['results']}
+    for result in results:
+        before = previous.get((result['name'], result['size']))
+        if not before:
+            continue
+        key = 'bytes' if 'bytes' in result else 'p50'
+        if before.get(key):
+            print("%-30s %10s %-6s %8.2fx" % (result['name'], result['size'], key, result[key] / before[key]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=50, help="operations timed per measurement")
+    parser.add_argument('--store', choices=sorted(stores), default='tropics', help="storage backend")
+    parser.add_argument('--output', help="write JSON results here")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    results = bench_import()
+    results.extend(bench_metrics(args.ops * 10))
+    results.extend(bench_policy(args.ops * 10))
+    for size in args.sizes:
+        results.extend(bench_auth(size, args.ops, directory, stores[args.store]))
+    os.rmdir(directory)
+
+    for result in results:
+        if 'bytes' in result:
+            print("%-30s %10s %12d bytes" % (result['name'], result['size'], result['bytes']))
+        else:
+            print("%-30s %10s %12.1f ops/s  p50 %.6fs  p99 %.6fs" % (
+                result['name'], result['size'], result['ops_per_sec'], result['p50'], result['p99']))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': args.sizes,
+            'store': args.store,
+            'ops': args.ops
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return report
+
+
+if __name__ == '__main__':
+    main()
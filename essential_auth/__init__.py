@@ -1,5 +1,31 @@
 from .phrasemetrics import Metrics, PhraseMetrics
 from .essentialauth import EssentialAuth, SessionAssurance, SessionAlreadyExistsException, ProfileAlreadyExistsException, ProfileNotFoundException, LoginAlreadyExistsException
+from .essentialauth import PassphrasePolicyException, MemoryTropicsStorage
+from .sessioncache import SessionCache
+from .sessiontokens import SignedSessionTokens
+from .sessionsweeper import SessionSweeper
+from .phrasedictionary import PhraseDictionary
+from .phrasepolicy import PhrasePolicy
+from .phrasemeter import PhraseMeter
+from .registry import shared_auth, close_all
 
+# imported on first use - asyncio and process pools are not needed to check a passphrase
+_lazy = {
+    'AsyncEssentialAuth': 'asyncauth',
+    'session_middleware': 'asyncauth',
+    'PooledHash': 'hashpool',
+    'HashPoolBusyException': 'hashpool',
+    'SQLiteStorage': 'sqlitestorage',
+    'SharedTropicsStorage': 'sharedstorage',
+    'JournalTropicsStorage': 'journalstorage',
+    'FlaskEssentialAuth': 'flaskauth'
+}
 
 
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    from importlib import import_module
+    value = getattr(import_module('.' + _lazy[name], __name__), name)
+    globals()[name] = value
+    return value
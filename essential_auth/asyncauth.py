@@ -0,0 +1,130 @@
+import asyncio
+import functools
+from .essentialauth import EssentialAuth, EssentialTropicsStorage, PBKDF2Hash, SessionAssurance
+
+
+class AsyncEssentialAuth:
+    """
+    Awaitable front end to EssentialAuth. Hashing and anything that writes to the store runs on
+    'executor' (the loop's default executor if None). Lookups are served directly on the event loop
+    when the store keeps everything in memory.
+    """
+
+    def __init__(self, config=None, store_class=EssentialTropicsStorage, hash_class=PBKDF2Hash, executor=None):
+        self.auth = EssentialAuth(config, store_class, hash_class)
+        self.executor = executor
+        self.loop = None
+        self.auth.writes.schedule = self._schedule
+        self.memory_reads = all(getattr(store, 'in_memory', False)
+                                for store in (self.auth.store, self.auth.session_store))
+
+    @property
+    def config(self):
+        return self.auth.config
+
+    async def _run(self, func, *args, **kwargs):
+        self.loop = asyncio.get_running_loop()
+        return await self.loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def _read(self, func, *args, **kwargs):
+        if self.memory_reads:
+            return func(*args, **kwargs)
+        return await self._run(func, *args, **kwargs)
+
+    def _schedule(self, flush):
+        # called from the loop or an executor thread - hand the flush back to the executor either way
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.run_in_executor, self.executor, flush)
+        else:
+            flush()
+
+    async def flush(self):
+        return await self._run(self.auth.flush)
+
+    async def close(self):
+        return await self._run(self.auth.close)
+
+    async def check_login_available(self, login):
+        return await self._read(self.auth.check_login_available, login)
+
+    async def add_profile(self, profile):
+        return await self._run(self.auth.add_profile, profile)
+
+    async def add_profiles(self, profiles):
+        return await self._run(self.auth.add_profiles, profiles)
+
+    async def import_profiles(self, profiles, chunk_size=None):
+        return await self._run(self.auth.import_profiles, profiles, chunk_size)
+
+    async def update_profile(self, profile):
+        return await self._run(self.auth.update_profile, profile)
+
+    async def get_profile(self, id=None, login=None):
+        return await self._read(self.auth.get_profile, id, login)
+
+    async def get_profiles(self):
+        return await self._read(self.auth.get_profiles)
+
+    async def remove_profile(self, id=None, login=None):
+        return await self._run(self.auth.remove_profile, id, login)
+
+    async def set_passphrase(self, login, passphrase):
+        return await self._run(self.auth.set_passphrase, login, passphrase)
+
+    async def set_passphrases(self, passphrases, chunk_size=None):
+        return await self._run(self.auth.set_passphrases, passphrases, chunk_size)
+
+    async def verify_by_passphrase(self, login, passphrase):
+        return await self._run(self.auth.verify_by_passphrase, login, passphrase)
+
+    async def remove_passphrase(self, login):
+        return await self._run(self.auth.remove_passphrase, login)
+
+    async def start_session(self, login, passphrase):
+        return await self._run(self.auth.start_session, login, passphrase)
+
+    async def validate_session(self, token):
+        """
+        Signed tokens need no storage and are validated on the loop. In touch mode a live session is
+        validated on the loop too - the deferred last_seen flush is handed to the executor. Anything
+        that will write (expiry, or touch mode being off) runs on the executor.
+        """
+        self.loop = asyncio.get_running_loop()
+        if self.memory_reads and self.auth.tokens:
+            return self.auth.validate_session(token)
+        if self.memory_reads and self.auth.config['session_touch']:
+            session = self.auth.session_store.session(token=token)
+            if not session:
+                return False
+            if SessionAssurance.check_time(session, self.auth.config['session_idle_timeout'],
+                                           self.auth.config['session_absolute_timeout']):
+                return self.auth.validate_session(token)
+        return await self._run(self.auth.validate_session, token)
+
+    async def refresh_session(self, token):
+        if self.memory_reads and self.auth.tokens:
+            return self.auth.refresh_session(token)
+        return await self._run(self.auth.refresh_session, token)
+
+    async def end_session(self, token):
+        return await self._run(self.auth.end_session, token)
+
+
+def session_middleware(auth, cookie_name='token'):
+    """
+    aiohttp middleware validating the session cookie with an AsyncEssentialAuth. The token and the
+    profile (or None) are left on the request as request['token'] and request['profile'].
+    """
+
+    async def middleware(request, handler):
+        token = request.cookies.get(cookie_name)
+        profile = None
+        if token:
+            profile = await auth.validate_session(token) or None
+        request['token'] = token
+        request['profile'] = profile
+        return await handler(request)
+
+    # what aiohttp's @web.middleware sets, so aiohttp itself is not needed to import this module
+    middleware.__middleware_version__ = 1
+    return middleware
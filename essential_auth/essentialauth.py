@@ -1,7 +1,13 @@
-from essentialdb import EssentialDB
-from passlib.hash import pbkdf2_sha256
+import os
 import uuid
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from .sessioncache import SessionCache
+from .sessiontokens import SignedSessionTokens
+from .sessionsweeper import SessionSweeper
+from .phrasepolicy import PhrasePolicy
 
 class LoginAlreadyExistsException(Exception):
     pass
@@ -18,98 +24,322 @@ class VerificationFailedException(Exception):
 class SessionAlreadyExistsException(Exception):
     pass
 
+class PassphrasePolicyException(Exception):
+
+    def __init__(self, violations):
+        super().__init__("Passphrase violates policy: %s" % ", ".join(violations))
+        self.violations = violations
+
+
+def _pbkdf2_sha256():
+    # passlib is imported on first hash rather than with the package
+    from passlib.hash import pbkdf2_sha256
+    return pbkdf2_sha256
+
 
 class PBKDF2Hash:
 
-    @staticmethod
-    def hash(phrase):
-        return pbkdf2_sha256.hash(phrase)
+    # None keeps passlib's default - use PBKDF2Hash.using(rounds=PBKDF2Hash.calibrate()) to tune for the host
+    rounds = None
+
+    @classmethod
+    def handler(cls):
+        pbkdf2_sha256 = _pbkdf2_sha256()
+        return pbkdf2_sha256.using(rounds=cls.rounds or pbkdf2_sha256.default_rounds)
+
+    @classmethod
+    def hash(cls, phrase):
+        return cls.handler().hash(phrase)
 
     @staticmethod
     def verify(phrase, hash):
-        return pbkdf2_sha256.verify(phrase, hash)
+        return _pbkdf2_sha256().verify(phrase, hash)
+
+    @classmethod
+    def needs_update(cls, hash):
+        """
+        True if hash was made with parameters other than the current ones.
+        """
+        return cls.handler().needs_update(hash)
+
+    @classmethod
+    def using(cls, rounds):
+        return type(cls.__name__, (cls,), {'rounds': rounds})
+
+    @staticmethod
+    def calibrate(target_time=0.25, phrase="calibration passphrase"):
+        """
+        Benchmarks pbkdf2_sha256 on this host and returns the rounds that take about target_time
+        seconds to hash (or verify) a passphrase.
+        """
+        rounds = 1000
+        while True:
+            start = time.perf_counter()
+            _pbkdf2_sha256().using(rounds=rounds).hash(phrase)
+            elapsed = time.perf_counter() - start
+            # time enough rounds that timer resolution and call overhead don't skew the estimate
+            if elapsed >= 0.05:
+                break
+            rounds *= 2
+        return max(1000, int(rounds * target_time / elapsed))
+
+class FieldIndex:
+    """
+    Hashed index from the value of one document field to the set of _ids carrying that value.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.index = {}
+
+    def build(self, documents):
+        self.index = {}
+        for document in documents.values():
+            self.add(document)
+
+    def add(self, document):
+        if self.field in document:
+            self.index.setdefault(document[self.field], set()).add(document['_id'])
+
+    def remove(self, document):
+        ids = self.index.get(document.get(self.field))
+        if ids:
+            ids.discard(document['_id'])
+            if not ids:
+                del self.index[document[self.field]]
+
+    def find(self, value):
+        return self.index.get(value, ())
+
 
 class EssentialTropicsStorage:
 
+    # every read is served from memory, only writes touch the disk
+    in_memory = True
+
+    # other processes write to the same store - a per process SessionCache would go stale
+    multi_process = False
+
+    # fields looked up by value on the login and session paths
+    indexed_fields = {
+        'profiles': ('login',),
+        'credentials': ('login',),
+        'sessions': ('login', 'profile_id')
+    }
+
     def __init__(self, filepath):
-        self.db = EssentialDB(filepath=filepath)
-        self.db.sync()
+        # serializes writes, which hold it while the database is written out - reads never take it
+        self.lock = threading.RLock()
+        self.unsynced = False
+        self.db = self._open(filepath)
+        self._build_indexes()
 
     def profile(self, id=None, login=None ):
         if id:
             return self._profiles().get(id)
         if login:
-            return self._profiles().find_one({'login': login})
+            return self._find_one('profiles', 'login', login)
 
     def profiles(self):
         return self._profiles().find()
 
     def store_profile(self, profile):
-        with self._profiles() as profiles:
-            return profiles.insert_one(profile)
+        with self._writing('profiles') as profiles:
+            return self._insert('profiles', profiles, profile)
 
     def store_profiles(self, profiles):
-        with self._profiles() as profile_store:
-            return profile_store.insert_many(profiles)
+        with self._writing('profiles') as profile_store:
+            for profile in profiles:
+                self._insert('profiles', profile_store, profile)
+            return True
 
     def remove_profile(self, profile_id):
-        with self._profiles() as profiles:
-            return profiles.remove({'_id': profile_id})
+        with self._writing('profiles') as profiles:
+            return self._remove('profiles', profiles, profile_id)
 
     def credential(self, id=None, login=None ):
         if id:
             return self._credentials().get(id)
         elif login:
-            return self._credentials().find_one({'login': login})
+            return self._find_one('credentials', 'login', login)
         return None
 
     def store_credential(self, credential):
-        with self._credentials() as credential_collection:
-            credential_collection.insert_one(credential)
+        with self._writing('credentials') as credential_collection:
+            self._insert('credentials', credential_collection, credential)
+
+    def store_credentials(self, credentials):
+        with self._writing('credentials') as credential_collection:
+            for credential in credentials:
+                self._insert('credentials', credential_collection, credential)
+            return True
+
+    def stage_credential(self, credential):
+        """
+        Stores credential in memory only - it is persisted by the next sync().
+        """
+        with self.lock:
+            self._insert('credentials', self._credentials(), credential)
+            self.unsynced = True
 
     def remove_credential(self, id=None, login=None ):
-        with self._credentials() as credential_collection:
+        with self._writing('credentials') as credential_collection:
             if id:
-                return credential_collection.remove({'_id': id})
+                return self._remove('credentials', credential_collection, id)
             elif login:
-                return credential_collection.remove({'login': login})
+                ids = list(self.indexes['credentials']['login'].find(login))
+                return sum(self._remove('credentials', credential_collection, _id) for _id in ids)
             return None
 
     def session(self, token=None, login=None, profile_id=None):
         if token:
             return self._sessions().get(token)
         elif profile_id:
-            return self._sessions().find_one({'profile_id': profile_id})
+            return self._find_one('sessions', 'profile_id', profile_id)
         else:
-            return self._sessions().find_one({'login': login})
+            return self._find_one('sessions', 'login', login)
 
     def store_session(self, session):
-        with self._sessions() as credential_collection:
-           return credential_collection.insert_one(session)
+        with self._writing('sessions') as credential_collection:
+           return self._insert('sessions', credential_collection, session)
+
+    def sessions(self):
+        return self._sessions().find()
 
     def remove_session(self, token):
-        with self._sessions() as session_collection:
-            return session_collection.remove({'_id': token})
+        with self._writing('sessions') as session_collection:
+            return self._remove('sessions', session_collection, token)
+
+    def remove_sessions(self, tokens):
+        with self._writing('sessions') as session_collection:
+            return sum(self._remove('sessions', session_collection, token) for token in tokens)
+
+    def touch_session(self, token, last_seen):
+        """
+        Updates last_seen in memory only - it is persisted by the next sync().
+        """
+        session = self._sessions().get(token)
+        if session:
+            session['last_seen'] = last_seen
+            self.unsynced = True
+        return session
+
+    def sync(self):
+        """
+        Writes what touch_session and stage_credential changed in memory, if anything.
+        """
+        with self.lock:
+            if self.unsynced:
+                self.unsynced = False
+                self.db.sync()
+
+    def _open(self, filepath):
+        from essentialdb import EssentialDB
+        if os.path.exists(filepath):
+            return EssentialDB(filepath=filepath)
+        # nothing to load - the file is written by the first change, opening never writes
+        db = EssentialDB()
+        db.filepath = filepath
+        return db
+
+    @contextmanager
+    def _writing(self, name):
+        # the collection to change - it is written out when the block exits
+        with self.lock:
+            with self.db.get_collection(name) as collection:
+                yield collection
+                if collection.dirty:
+                    # the whole database is about to be written, what touch_session and stage_credential
+                    # held with it - cleared first, so a touch that lands while it is written sets it again
+                    self.unsynced = False
+
+    def _build_indexes(self):
+        self.indexes = {name: self._collection_indexes(name) for name in self.indexed_fields}
+
+    def _collection_indexes(self, name):
+        documents = self.db.get_collection(name)._get_raw_documents()
+        indexes = {}
+        for field in self.indexed_fields[name]:
+            index = FieldIndex(field)
+            index.build(documents)
+            indexes[field] = index
+        return indexes
+
+    def _find_one(self, name, field, value):
+        collection = self._collection(name)
+        # copying the set is a single step under the GIL, so a lookup never waits for a write to finish
+        ids = tuple(self.indexes[name][field].find(value))
+        for _id in ids:
+            document = collection.get(_id)
+            if document and document.get(field) == value:
+                return document
+        return None
+
+    def _insert(self, name, collection, document):
+        existing = collection.get(document['_id']) if '_id' in document else None
+        if existing:
+            for index in self.indexes[name].values():
+                index.remove(existing)
+        result = collection.insert_one(document)
+        stored = collection.get(result)
+        for index in self.indexes[name].values():
+            index.add(stored)
+        return result
+
+    def _remove(self, name, collection, _id):
+        existing = collection.get(_id)
+        if not existing:
+            return 0
+        for index in self.indexes[name].values():
+            index.remove(existing)
+        return collection.remove({'_id': _id})
+
+    def _collection(self, name):
+        return self.db.get_collection(name)
 
     def _profiles(self):
-        return self.db.get_collection("profiles")
+        return self._collection("profiles")
 
     def _credentials(self):
-        return self.db.get_collection("credentials")
+        return self._collection("credentials")
 
     def _sessions(self):
-        return self.db.get_collection("sessions")
+        return self._collection("sessions")
 
     def _reset_all(self, seriously):
         if seriously:
-            with self._profiles() as profiles:
+            with self._writing('profiles') as profiles:
                 profiles.remove()
-            with self._credentials() as credentials:
+            with self._writing('credentials') as credentials:
                 credentials.remove()
+            self._build_indexes()
             return True
 
         return False
 
+
+class MemoryTropicsStorage(EssentialTropicsStorage):
+    """
+    EssentialTropicsStorage that never writes to disk, for data that need not outlive the process -
+    sessions, say: {'session_store_class': MemoryTropicsStorage}. filepath is ignored.
+    """
+
+    def __init__(self, filepath=None):
+        super().__init__(filepath)
+
+    def _open(self, filepath):
+        from essentialdb import EssentialDB
+        return EssentialDB()
+
+    def sync(self):
+        pass
+
+    @contextmanager
+    def _writing(self, name):
+        with self.lock:
+            yield self.db.get_collection(name)
+
+
 class SessionAssurance:
 
     @staticmethod
@@ -140,13 +370,109 @@ class SessionAssurance:
 
 
 
+class WriteCoalescer:
+    """
+    Counts writes that were applied to the stores in memory only and syncs them to disk in batches,
+    once 'size' writes are pending or 'interval' seconds have passed since the last flush - a timer
+    flushes what a burst left pending even if no further write arrives.
+
+    Flushes run inline (or on the timer's thread) unless 'schedule' is set, in which case it is
+    called with the flush function and is expected to run it later (on an executor, for example).
+    Call close() at shutdown, or writes made since the last flush are lost.
+    """
+
+    def __init__(self, stores, interval=10, size=1000, schedule=None):
+        self.stores = stores
+        self.interval = interval
+        self.size = size
+        self.schedule = schedule
+        self.pending = 0
+        self.flushing = False
+        self.last_flush = time.monotonic()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, count=1):
+        with self.lock:
+            self.pending += count
+            elapsed = time.monotonic() - self.last_flush
+            due = not self.flushing and (self.pending >= self.size or elapsed >= self.interval)
+            if due:
+                self.flushing = True
+            elif self.timer is None and self.interval:
+                self.timer = threading.Timer(max(0, self.interval - elapsed), self._expire)
+                self.timer.daemon = True
+                self.timer.start()
+        if due:
+            self._run()
+
+    def flush(self):
+        with self.lock:
+            flushed = self.pending
+            self.pending = 0
+            self.flushing = False
+            self.last_flush = time.monotonic()
+            timer, self.timer = self.timer, None
+        if timer:
+            timer.cancel()
+        if flushed:
+            for store in self.stores:
+                store.sync()
+        return flushed
+
+    def close(self):
+        """
+        Stops the timer and flushes what is pending. Returns the number of writes flushed.
+        """
+        return self.flush()
+
+    def _expire(self):
+        with self.lock:
+            self.timer = None
+            due = self.pending and not self.flushing
+            if due:
+                self.flushing = True
+        if due:
+            self._run()
+
+    def _run(self):
+        if self.schedule:
+            self.schedule(self.flush)
+        else:
+            self.flush()
+
+
 class EssentialAuth:
 
     default_config = {
         'db_location': "tropics.db",
         'allow_multi_sessions': True,
         'session_idle_timeout': 10,
-        'session_absolute_timeout': 20
+        'session_absolute_timeout': 20,
+        # touch mode keeps last_seen in memory and flushes it in batches - close() flushes at shutdown.
+        # Not for sessions in a store shared between processes, where the others would not see the touches
+        'session_touch': False,
+        'session_touch_granularity': 1,
+        'session_flush_interval': 10,
+        'session_flush_size': 1000,
+        # number of hot sessions (and their profiles) cached in process, 0 disables the cache
+        'session_cache_size': 0,
+        'import_chunk_size': 50000,
+        # 'stored' sessions live in the store, 'signed' sessions live in HMAC signed tokens
+        'session_tokens': 'stored',
+        'session_secret': None,
+        # seconds between background sweeps of expired sessions, 0 disables the sweeper
+        'session_sweep_interval': 0,
+        'session_sweep_bucket': 60,
+        'session_sweep_batch': 1000,
+        # re-hash passphrases made with outdated hasher parameters when they next verify
+        'rehash_on_verify': True,
+        # PhrasePolicy arguments (or a PhrasePolicy) new passphrases must pass, None accepts any passphrase
+        'passphrase_policy': None,
+        # sessions in a store of their own - session_store_class (None for store_class) opened at
+        # session_db_location (None for db_location + '.sessions'); both None keeps them in the main store
+        'session_db_location': None,
+        'session_store_class': None
     }
 
     def __init__(self, config=None, store_class=EssentialTropicsStorage, hash_class=PBKDF2Hash ):
@@ -156,12 +482,75 @@ class EssentialAuth:
         self.config.update(config)
 
         self.store = store_class(self.config['db_location'])
+        self.session_store = self.store
+        if self.config['session_db_location'] or self.config['session_store_class']:
+            session_store_class = self.config['session_store_class'] or store_class
+            self.session_store = session_store_class(self.config['session_db_location'] or
+                                                     self.config['db_location'] + '.sessions')
         self.hasher = hash_class()
+        self.policy = self.config['passphrase_policy']
+        if isinstance(self.policy, dict):
+            self.policy = PhrasePolicy(**self.policy)
+        if self.policy:
+            self.policy.prepare()
+        self.stores = [self.store] if self.session_store is self.store else [self.store, self.session_store]
+        self.writes = WriteCoalescer(self.stores, self.config['session_flush_interval'],
+                                     self.config['session_flush_size'])
+        if self.config['session_touch'] and getattr(self.session_store, 'multi_process', False):
+            raise AttributeError("session_touch can not be used with sessions in a store shared between processes - "
+                                 "another process would expire a session on the last_seen this one holds in memory")
+        self.cache = None
+        if self.config['session_cache_size']:
+            if any(getattr(store, 'multi_process', False) for store in (self.store, self.session_store)):
+                raise AttributeError("session_cache_size can not be used with a store shared between processes - "
+                                     "sessions ended by another process would stay cached")
+            self.cache = SessionCache(self.config['session_cache_size'], self.config['session_idle_timeout'],
+                                      self.config['session_absolute_timeout'])
+        self.tokens = None
+        if self.config['session_tokens'] == 'signed':
+            if not self.config['allow_multi_sessions']:
+                raise AttributeError("Signed session tokens can not enforce allow_multi_sessions=False")
+            self.tokens = SignedSessionTokens(self.config['session_secret'], self.config['session_absolute_timeout'],
+                                              self.config['session_idle_timeout'])
+        self.sweeper = None
+        if self.config['session_sweep_interval'] and not self.tokens:
+            self.sweeper = SessionSweeper(self.session_store, self.config['session_idle_timeout'],
+                                          self.config['session_absolute_timeout'],
+                                          self.config['session_sweep_bucket'], self.config['session_sweep_batch'])
+            self.sweeper.build()
+            self.sweeper.start(self.config['session_sweep_interval'])
 
 
     def _reset_all(self, seriously):
+        if seriously and self.cache:
+            self.cache.clear()
         self.store._reset_all(seriously)
 
+    def flush(self):
+        """
+        Persists any writes held in memory by touch mode. Returns the number of writes flushed.
+        """
+        return self.writes.flush()
+
+    def close(self):
+        """
+        Stops background work, flushes pending writes and closes the stores that can be closed (the
+        others are synced) and the hasher, if it can be. Returns the number of writes flushed.
+        """
+        if self.sweeper:
+            self.sweeper.stop()
+        flushed = self.writes.close()
+        for store in self.stores:
+            close = getattr(store, 'close', None)
+            if close:
+                close()
+            else:
+                store.sync()
+        close = getattr(self.hasher, 'close', None)
+        if close:
+            close()
+        return flushed
+
     def check_login_available(self, login):
         existing = self.get_profile_by_login(login)
         return not existing
@@ -170,35 +559,86 @@ class EssentialAuth:
         """
         Fails if user exists!
         """
-        if '_id' not in profile and 'login' not in profile:
-            raise(AttributeError("Profile object must speciful 'login' or '_id"))
-        if '_id' not in profile:
-            profile['_id'] = profile['login']
-
-        if self.store.profile(id=profile['_id']):
-           raise(ProfileAlreadyExistsException())
-        elif self.store.profile(login=profile['login']):
-            raise(LoginAlreadyExistsException())
+        problem = self._check_new_profile(profile, set(), set())
+        if problem:
+            raise problem
 
         return self.store.store_profile(profile)
 
 
     def add_profiles(self, profiles):
+        """
+        Adds all profiles or none - raises on the first conflict, including conflicts within profiles.
+        """
+        profiles = list(profiles)
+        seen_ids, seen_logins = set(), set()
         for profile in profiles:
-            if self.store.profile(id=profile['_id']):
-                raise (ProfileAlreadyExistsException())
-            elif self.store.profile(login=profile['login']):
-                raise (LoginAlreadyExistsException())
+            problem = self._check_new_profile(profile, seen_ids, seen_logins)
+            if problem:
+                raise problem
 
         self.store.store_profiles(profiles)
 
         return len(profiles)
 
+    def import_profiles(self, profiles, chunk_size=None):
+        """
+        Bulk import from any iterable (or generator) of profiles, stored 'import_chunk_size' at a time.
+        Profiles that conflict with stored profiles, or with earlier profiles in the same import, are
+        rejected rather than raised.
+
+        Returns:
+            (added, rejects) where rejects is a list of (profile, exception) pairs.
+        """
+        chunk_size = chunk_size or self.config['import_chunk_size']
+        seen_ids, seen_logins = set(), set()
+        added, rejects, chunk = 0, [], []
+
+        for profile in profiles:
+            problem = self._check_new_profile(profile, seen_ids, seen_logins)
+            if problem:
+                rejects.append((profile, problem))
+                continue
+            chunk.append(profile)
+            if len(chunk) >= chunk_size:
+                self.store.store_profiles(chunk)
+                added += len(chunk)
+                chunk = []
+
+        if chunk:
+            self.store.store_profiles(chunk)
+            added += len(chunk)
+
+        return added, rejects
+
+    def _check_new_profile(self, profile, seen_ids, seen_logins):
+        """
+        Returns the exception describing why profile can't be added, or None if it can. Accepted
+        _ids and logins are recorded in seen_ids and seen_logins.
+        """
+        if '_id' not in profile and 'login' not in profile:
+            return AttributeError("Profile object must specify 'login' or '_id'")
+        if '_id' not in profile:
+            profile['_id'] = profile['login']
+
+        _id, login = profile['_id'], profile.get('login')
+        if _id in seen_ids or self.store.profile(id=_id):
+            return ProfileAlreadyExistsException(_id)
+        if login is not None and (login in seen_logins or self.store.profile(login=login)):
+            return LoginAlreadyExistsException(login)
+
+        seen_ids.add(_id)
+        if login is not None:
+            seen_logins.add(login)
+        return None
+
     def update_profile(self, profile):
         existing = self.store.profile(id=profile['_id'])
         if not existing:
            raise(ProfileNotFoundException())
 
+        if self.cache:
+            self.cache.invalidate_profile(profile['_id'])
         return self.store.store_profile(profile)
 
     def get_profile(self, id=None, login=None):
@@ -211,16 +651,66 @@ class EssentialAuth:
         profile = self.get_profile(id=id, login=login)
         if not profile:
             return False
+        if self.cache:
+            self.cache.invalidate_profile(profile['_id'])
         return self.store.remove_profile(profile['_id'])
 
 
     def set_passphrase(self, login, passphrase):
-        #TODO: check password rules
+        """
+        Raises:
+            PassphrasePolicyException, with the list of issues in .violations, if passphrase fails the policy.
+            ProfileNotFoundException if login does not exist.
+        """
+        creds = self._new_credential(login, passphrase)
+        if isinstance(creds, Exception):
+            raise creds
+        return self.store.store_credential(creds)
+
+    def set_passphrases(self, passphrases, chunk_size=None):
+        """
+        Bulk credential import from any iterable of (login, passphrase) pairs, stored 'import_chunk_size'
+        at a time. Passphrases that fail the policy, or whose login does not exist, are rejected rather
+        than raised.
+
+        Returns:
+            (added, rejects) where rejects is a list of (login, exception) pairs.
+        """
+        chunk_size = chunk_size or self.config['import_chunk_size']
+        added, rejects, chunk = 0, [], []
+
+        for login, passphrase in passphrases:
+            creds = self._new_credential(login, passphrase)
+            if isinstance(creds, Exception):
+                rejects.append((login, creds))
+                continue
+            chunk.append(creds)
+            if len(chunk) >= chunk_size:
+                self.store.store_credentials(chunk)
+                added += len(chunk)
+                chunk = []
+
+        if chunk:
+            self.store.store_credentials(chunk)
+            added += len(chunk)
+
+        return added, rejects
+
+    def _new_credential(self, login, passphrase):
+        """
+        Returns the credential document for login with passphrase hashed, or the exception describing
+        why it can't be set. The policy is checked first - it costs far less than the hash.
+        """
+        if self.policy:
+            violations = self.policy.check(passphrase)
+            if violations:
+                return PassphrasePolicyException(violations)
+
         creds = self.store.credential(login=login)
         if not creds:
             profile = self.store.profile(login=login)
             if not profile:
-                raise ProfileNotFoundException("Login '%s' does not exist." % login)
+                return ProfileNotFoundException("Login '%s' does not exist." % login)
             creds = {
                 '_id': profile['_id'],
                 'login': login,
@@ -229,15 +719,26 @@ class EssentialAuth:
             }
         creds['updated'] = datetime.now()
         creds['hash'] = self.hasher.hash(passphrase)
-        return self.store.store_credential(creds)
+        return creds
 
 
     def verify_by_passphrase(self, login, passphrase):
         creds = self.store.credential(login=login)
         if not creds or 'hash' not in creds or not creds['hash']:
             return False
-        else:
-            return self.hasher.verify(passphrase, creds['hash'])
+
+        verified = self.hasher.verify(passphrase, creds['hash'])
+        if verified and self.config['rehash_on_verify'] and self._needs_rehash(creds['hash']):
+            # the new hash rides along with the next batch of in-memory writes
+            creds['hash'] = self.hasher.hash(passphrase)
+            creds['updated'] = datetime.now()
+            self.store.stage_credential(creds)
+            self.writes.add()
+        return verified
+
+    def _needs_rehash(self, hash):
+        needs_update = getattr(self.hasher, 'needs_update', None)
+        return bool(needs_update and needs_update(hash))
 
     def remove_passphrase(self, login):
         return self.store.remove_credential(login=login)
@@ -255,12 +756,15 @@ class EssentialAuth:
 
         # Allow multi-sessions
         if not self.config['allow_multi_sessions']:
-            if self.session(login=login):
+            if self.session_store.session(login=login):
                 raise SessionAlreadyExistsException
 
         profile = self.store.profile(login=login)
 
-        token = uuid.uuid4()
+        if self.tokens:
+            return self.tokens.issue(profile['_id'], profile['login'])
+
+        token = str(uuid.uuid4())
 
         now = datetime.now()
 
@@ -272,14 +776,23 @@ class EssentialAuth:
             'last_seen': now
         }
 
-        if self.store.store_session(session):
+        if self.session_store.store_session(session):
+            if self.sweeper:
+                self.sweeper.schedule(session)
             return token
         else:
             return None
 
 
     def validate_session(self, token):
-        session = self.store.session(token=token)
+        if self.tokens:
+            return self._validate_signed(token)
+
+        cached = self.cache.get(token) if self.cache else None
+        if cached:
+            session, profile = cached
+        else:
+            session, profile = self.session_store.session(token=token), None
 
         # first, was it present?
         if not session:
@@ -287,19 +800,59 @@ class EssentialAuth:
 
         # is it valid still?
         if not SessionAssurance.check_time(session, self.config['session_idle_timeout'], self.config['session_absolute_timeout']):
-            self.store.remove_session(token)
+            self.session_store.remove_session(token)
+            if self.cache:
+                self.cache.invalidate(token)
             return False
 
         # looks go so far, so update and store
-        session['last_seen'] = datetime.now()
-        self.store.store_session(session)
+        now = datetime.now()
+        if self.config['session_touch'] or cached:
+            # only touch memory, and only when last_seen moved enough to matter - a cached session is
+            # always touched, as writing it through would cost the store write the cache is there to save
+            if now - session['last_seen'] >= timedelta(seconds=self.config['session_touch_granularity']):
+                session['last_seen'] = now
+                self.session_store.touch_session(token, now)
+                self.writes.add()
+        else:
+            session['last_seen'] = now
+            self.session_store.store_session(session)
+
+        if not cached:
+            profile = self.get_profile(id=session['profile_id'])
+        if self.cache and profile:
+            self.cache.put(token, session, profile)
+        return profile
+
+    def refresh_session(self, token):
+        """
+        Returns a token for the session that restarts its idle timeout, or False if it is no longer valid.
+        Signed tokens are reissued, stored sessions keep their token and are simply touched.
+        """
+        if not self.validate_session(token):
+            return False
+        if self.tokens:
+            return self.tokens.reissue(self.tokens.decode(token))
+        return token
+
+    def _validate_signed(self, token):
+        session = self.tokens.decode(token)
+        if not session:
+            return False
+        if not SessionAssurance.check_time(session, self.config['session_idle_timeout'], self.config['session_absolute_timeout']):
+            return False
         return self.get_profile(id=session['profile_id'])
 
     def end_session(self, token):
-        session = self.store.session(token=token)
+        if self.tokens:
+            return self.tokens.revoke(token)
+
+        session = self.session_store.session(token=token)
 
         # first, was it present?
         if not session:
             return False
 
-        return self.store.remove_session(token)
+        if self.cache:
+            self.cache.invalidate(token)
+        return self.session_store.remove_session(token)
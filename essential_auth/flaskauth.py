@@ -0,0 +1,42 @@
+from .essentialauth import EssentialTropicsStorage, PBKDF2Hash
+from .registry import shared_auth
+
+
+class FlaskEssentialAuth:
+    """
+    Flask extension that gives every request the app's shared EssentialAuth::
+
+        app.config['ESSENTIAL_AUTH'] = {'db_location': 'tropics.db'}
+        essential = FlaskEssentialAuth(app)
+
+        @app.route('/')
+        def index():
+            profile = essential.auth.validate_session(session['token'])
+
+    The instance comes from shared_auth, so it is opened by the first request that uses it and only
+    once per process, whatever the number of apps or threads - a request costs a dictionary lookup.
+    'config' given here is overridden by app.config['ESSENTIAL_AUTH'].
+    """
+
+    def __init__(self, app=None, config=None, store_class=EssentialTropicsStorage, hash_class=PBKDF2Hash):
+        self.config = config or {}
+        self.store_class = store_class
+        self.hash_class = hash_class
+        self.instances = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ESSENTIAL_AUTH', {})
+        app.extensions['essential_auth'] = self
+
+    @property
+    def auth(self):
+        from flask import current_app
+        app = current_app._get_current_object()
+        auth = self.instances.get(app)
+        if auth is None:
+            config = dict(self.config)
+            config.update(app.config['ESSENTIAL_AUTH'])
+            auth = self.instances[app] = shared_auth(config, self.store_class, self.hash_class)
+        return auth
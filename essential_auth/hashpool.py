@@ -0,0 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import os
+import threading
+from .essentialauth import PBKDF2Hash
+
+
+class HashPoolBusyException(Exception):
+    pass
+
+
+def _hash(hash_class, rounds, phrase):
+    if rounds:
+        hash_class = hash_class.using(rounds=rounds)
+    return hash_class.hash(phrase)
+
+
+def _verify(hash_class, phrase, hash):
+    return hash_class.verify(phrase, hash)
+
+
+class HashLane:
+    """
+    One worker-process pool with admission control - at most 'queue_size' jobs may be queued or
+    running, and callers wait at most 'timeout' seconds to get in and again for their result. A job
+    keeps its slot until it finishes, even when its caller has given up waiting on it.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def run(self, func, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise HashPoolBusyException("Hashing queue is full")
+        try:
+            future = self._executor().submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda done: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # only stops a job that has not started - a running one holds its slot until it ends
+            future.cancel()
+            raise HashPoolBusyException("Hashing timed out")
+
+    def close(self):
+        with self.lock:
+            if self.executor:
+                self.executor.shutdown()
+                self.executor = None
+
+    def _executor(self):
+        with self.lock:
+            if not self.executor:
+                self.executor = ProcessPoolExecutor(self.workers)
+            return self.executor
+
+
+class PooledHash:
+    """
+    Drop in hash_class for EssentialAuth that runs hash_class (PBKDF2Hash by default) in worker
+    processes, so hashing neither holds the GIL nor ties up the calling thread past 'timeout'.
+
+    verify() - logins - runs in its own priority lane, so a storm of hash() calls from passphrase
+    changes and imports never delays them. By default the cores are split between the lanes, half
+    (rounded up) for verify and the rest for hash(). validate_session never hashes at all, so with
+    hashing out of process it only competes with threads that are parked waiting on a worker.
+    EssentialAuth.close() shuts the worker pools down.
+
+    Use functools.partial(PooledHash, workers=4, ...) to pass options through EssentialAuth. Tune
+    the cost with 'rounds' rather than a PBKDF2Hash.using() class, which can't be sent to workers.
+    """
+
+    hash_class = PBKDF2Hash
+
+    def __init__(self, workers=None, priority_workers=None, queue_size=64, timeout=10, hash_class=None, rounds=None):
+        if hash_class:
+            self.hash_class = hash_class
+        self.rounds = rounds
+        cores = os.cpu_count() or 1
+        if priority_workers is None:
+            priority_workers = (cores + 1) // 2
+        if workers is None:
+            workers = max(1, cores - priority_workers)
+        self.priority = HashLane(priority_workers, queue_size, timeout)
+        self.bulk = HashLane(workers, queue_size, timeout)
+
+    def hash(self, phrase):
+        return self.bulk.run(_hash, self.hash_class, self.rounds, phrase)
+
+    def verify(self, phrase, hash):
+        return self.priority.run(_verify, self.hash_class, phrase, hash)
+
+    def needs_update(self, hash):
+        hash_class = self.hash_class.using(rounds=self.rounds) if self.rounds else self.hash_class
+        needs_update = getattr(hash_class, 'needs_update', None)
+        return bool(needs_update and needs_update(hash))
+
+    def close(self):
+        self.priority.close()
+        self.bulk.close()
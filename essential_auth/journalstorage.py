@@ -0,0 +1,257 @@
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from .essentialauth import EssentialTropicsStorage
+
+# every record is framed by its length and crc32, so a write torn by a crash is found on replay
+_frame = struct.Struct('<II')
+
+
+class JournalTropicsStorage(EssentialTropicsStorage):
+    """
+    EssentialTropicsStorage that appends each change to a journal rather than rewriting the database -
+    pass store_class=JournalTropicsStorage, or JournalTropicsStorage.using(...) to tune it.
+
+    A change is one small record (the stored document, the removed _id, a session's new last_seen)
+    appended to db_location + '.journal', so a write costs the size of what changed. Records made
+    while the store is locked are written together, and threads waiting on an fsync share the next
+    one. 'fsync' decides when records are forced to disk:
+
+        'always'    before the write returns
+        'interval'  at most fsync_interval seconds later - by the next write or a timer - and by sync()
+        'never'     left to the operating system
+
+    Once the journal outgrows compact_size bytes a background thread folds it into a new snapshot at
+    db_location - in the format EssentialTropicsStorage reads - and the journal starts over. Opening
+    loads the snapshot and replays the journal, dropping a torn record at its end.
+
+    touch_session and stage_credential records are held in memory until the next write or sync().
+    The journal is appended to by one process - see SharedTropicsStorage for several.
+    """
+
+    # reads come from memory and take no lock, so they never wait on the journal - see AsyncEssentialAuth
+    in_memory = True
+
+    fsync = 'interval'
+    fsync_interval = 1.0
+    compact_size = 64 * 1024 * 1024
+
+    @classmethod
+    def using(cls, fsync=None, fsync_interval=None, compact_size=None):
+        options = {'fsync': fsync, 'fsync_interval': fsync_interval, 'compact_size': compact_size}
+        return type(cls.__name__, (cls,), {name: value for name, value in options.items() if value is not None})
+
+    def __init__(self, filepath):
+        if self.fsync not in ('always', 'interval', 'never'):
+            raise ValueError("fsync must be 'always', 'interval' or 'never', not %r" % (self.fsync,))
+        self.filepath = filepath
+        self.journal_path = filepath + '.journal'
+        self.compacting_path = filepath + '.journal.compacting'
+        self.journal = None
+        self.pending = []
+        # appended counts journal writes, synced the writes known to be on disk
+        self.appended = 0
+        self.synced = 0
+        self.last_fsync = time.monotonic()
+        self.fsync_lock = threading.Lock()
+        self.compaction_lock = threading.Lock()
+        self.compactor = None
+        self.fsync_timer = None
+        super().__init__(filepath)
+
+        replayed = self._replay(self.compacting_path) + self._replay(self.journal_path)
+        if replayed:
+            self._build_indexes()
+
+    def touch_session(self, token, last_seen):
+        """
+        Updates last_seen in memory - it is journaled by the next write or sync().
+        """
+        with self.lock:
+            session = super().touch_session(token, last_seen)
+            if session:
+                self._record('touch', 'sessions', token, last_seen)
+        return session
+
+    def sync(self):
+        """
+        Writes the records held in memory and, unless fsync is 'never', forces the journal to disk.
+        """
+        self._commit(durable=self.fsync != 'never')
+
+    def close(self):
+        with self.lock:
+            timer, self.fsync_timer = self.fsync_timer, None
+        if timer:
+            timer.cancel()
+        self.sync()
+        compactor = self.compactor
+        if compactor:
+            compactor.join()
+        with self.lock, self.fsync_lock:
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+
+    def compact(self):
+        """
+        Folds the journal into a new snapshot at db_location and starts an empty journal.
+        """
+        with self.compaction_lock:
+            with self.lock, self.fsync_lock:
+                self._write_pending()
+                if self.journal:
+                    if self.fsync != 'never':
+                        os.fsync(self.journal.fileno())
+                    self.journal.close()
+                    self.journal = None
+                    self.synced = self.appended
+                if not os.path.exists(self.journal_path):
+                    return False
+                self._rotate()
+                collections = {name: dict(collection._get_raw_documents())
+                               for name, collection in self.db.collections.items()}
+
+            output = {
+                "meta": {"timestamp": datetime.now()},
+                "collections": collections
+            }
+            written = "%s.%d.tmp" % (self.filepath, os.getpid())
+            with open(written, 'wb') as file:
+                pickle.dump(output, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(written, self.filepath)
+            os.remove(self.compacting_path)
+            return True
+
+    @contextmanager
+    def _writing(self, name):
+        with self.lock:
+            yield self.db.get_collection(name)
+        self._commit()
+
+    def _insert(self, name, collection, document):
+        result = super()._insert(name, collection, document)
+        self._record('put', name, collection.get(result))
+        return result
+
+    def _remove(self, name, collection, _id):
+        removed = super()._remove(name, collection, _id)
+        if removed:
+            self._record('delete', name, _id)
+        return removed
+
+    def _reset_all(self, seriously):
+        if not super()._reset_all(seriously):
+            return False
+        with self._writing('profiles'):
+            self._record('clear', 'profiles')
+            self._record('clear', 'credentials')
+        return True
+
+    def _record(self, *record):
+        # encoded now, as the documents it holds go on changing in memory
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.pending.append(_frame.pack(len(data), zlib.crc32(data)) + data)
+
+    def _write_pending(self):
+        # the caller holds self.lock
+        if not self.pending:
+            return
+        if self.journal is None:
+            self.journal = open(self.journal_path, 'ab', buffering=0)
+        self.journal.write(b''.join(self.pending))
+        self.pending = []
+        self.appended += 1
+
+    def _commit(self, durable=False):
+        with self.lock:
+            self._write_pending()
+            appended = self.appended
+            journal = self.journal
+            size = journal.tell() if journal else 0
+
+        if journal and (durable or self.fsync == 'always' or
+                        (self.fsync == 'interval' and time.monotonic() - self.last_fsync >= self.fsync_interval)):
+            with self.fsync_lock:
+                # one fsync covers every write made before it, so a thread that waited here may be done
+                if self.synced < appended and journal is self.journal:
+                    synced = self.appended
+                    os.fsync(journal.fileno())
+                    self.synced = synced
+                    self.last_fsync = time.monotonic()
+        if journal and self.fsync == 'interval' and self.synced < appended:
+            self._fsync_later()
+
+        if size >= self.compact_size and not (self.compactor and self.compactor.is_alive()):
+            self.compactor = threading.Thread(target=self.compact, daemon=True)
+            self.compactor.start()
+
+    def _fsync_later(self):
+        # a write followed by silence is still forced to disk once the interval is up
+        with self.lock:
+            if self.fsync_timer is None:
+                delay = max(0, self.fsync_interval - (time.monotonic() - self.last_fsync))
+                self.fsync_timer = threading.Timer(delay, self._fsync_due)
+                self.fsync_timer.daemon = True
+                self.fsync_timer.start()
+
+    def _fsync_due(self):
+        with self.lock:
+            self.fsync_timer = None
+        self._commit(durable=True)
+
+    def _rotate(self):
+        # the journal becomes the compacting journal, added to one left behind by a crashed compaction
+        if not os.path.exists(self.compacting_path):
+            os.replace(self.journal_path, self.compacting_path)
+            return
+        with open(self.journal_path, 'rb') as source, open(self.compacting_path, 'ab') as target:
+            target.write(source.read())
+            target.flush()
+            os.fsync(target.fileno())
+        os.remove(self.journal_path)
+
+    def _replay(self, path):
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0
+
+        offset = replayed = 0
+        while offset + _frame.size <= len(data):
+            length, crc = _frame.unpack_from(data, offset)
+            record = data[offset + _frame.size:offset + _frame.size + length]
+            if len(record) < length or zlib.crc32(record) != crc:
+                break
+            self._apply(pickle.loads(record))
+            offset += _frame.size + length
+            replayed += 1
+
+        if offset < len(data):
+            # a record torn by a crash - cut it off so later records are not written after it
+            with open(path, 'r+b') as file:
+                file.truncate(offset)
+        return replayed
+
+    def _apply(self, record):
+        operation, name = record[0], record[1]
+        documents = self.db.get_collection(name)._get_raw_documents()
+        if operation == 'put':
+            documents[record[2]['_id']] = record[2]
+        elif operation == 'delete':
+            documents.pop(record[2], None)
+        elif operation == 'touch':
+            session = documents.get(record[2])
+            if session:
+                session['last_seen'] = record[3]
+        elif operation == 'clear':
+            documents.clear()
@@ -0,0 +1,161 @@
+"""
+Vectorised Metrics.scan over a chunk of phrases. NumPy is optional - without it (and for phrases the
+fixed-width arrays don't suit: non-ascii or very long ones) each phrase goes through Metrics.scan.
+"""
+import math
+import string
+
+# imported by the first scan_chunk - None when NumPy is not installed
+_unloaded = object()
+numpy = _unloaded
+
+# phrases longer than this are scanned one at a time rather than widening the whole chunk
+max_width = 256
+
+_printable_codes = [ord(char) for char in string.printable]
+
+
+def scan_chunk(phrases):
+    """
+    Returns [Metrics.scan(phrase) for phrase in phrases], computing the character class counts,
+    entropy histograms, runs, digit sequences and walks of all ascii phrases at once.
+    """
+    from .phrasemetrics import Metrics
+
+    if numpy is _unloaded:
+        _load_numpy()
+    if numpy is None:
+        return [Metrics.scan(phrase) for phrase in phrases]
+
+    results = [None] * len(phrases)
+    rows = []
+    for position, phrase in enumerate(phrases):
+        if phrase and len(phrase) <= max_width and phrase.isascii():
+            rows.append(position)
+        else:
+            results[position] = Metrics.scan(phrase)
+    if not rows:
+        return results
+
+    batch = [phrases[position] for position in rows]
+    lengths = numpy.array([len(phrase) for phrase in batch])
+    width = int(lengths.max())
+    codes = numpy.array(batch, dtype='U%d' % width).view(numpy.uint32).reshape(len(batch), width)
+    valid = numpy.arange(width) < lengths[:, None]
+
+    lower = ((codes >= ord('a')) & (codes <= ord('z'))).sum(axis=1)
+    upper = ((codes >= ord('A')) & (codes <= ord('Z'))).sum(axis=1)
+    digits = (codes >= ord('0')) & (codes <= ord('9'))
+    number = digits.sum(axis=1)
+    punctuation = numpy.zeros(128, dtype=bool)
+    punctuation[[ord(char) for char in string.punctuation]] = True
+    special = punctuation[codes].sum(axis=1)
+    printable = numpy.zeros(128, dtype=bool)
+    printable[_printable_codes] = True
+    non_ascii = (~printable[codes & 127] & valid).sum(axis=1)
+
+    # one histogram column per printable character, in string.printable order
+    offsets = numpy.arange(len(batch))[:, None] * 128
+    histogram = numpy.bincount((offsets + codes).ravel(), minlength=len(batch) * 128).reshape(len(batch), 128)
+    histogram = histogram[:, _printable_codes]
+    # the non-zero counts of each row, still in printable order, without visiting the empty columns
+    present = histogram > 0
+    nonzero = numpy.split(histogram[present], numpy.cumsum(present.sum(axis=1))[:-1])
+
+    # runs of one character - '.' in (.)\1+ does not match a newline
+    same = (codes[:, 1:] == codes[:, :-1]) & valid[:, 1:] & (codes[:, 1:] != ord('\n'))
+    repeating = _longest_true_run(same)
+    repeating = numpy.where(repeating > 0, repeating + 1, 0)
+
+    values = codes.astype(numpy.int64) - ord('0')
+    both_digits = digits[:, 1:] & digits[:, :-1]
+    ascending = _longest_true_run(both_digits & (values[:, 1:] == values[:, :-1] + 1)) + 1
+    descending = _longest_true_run(both_digits & (values[:, 1:] == values[:, :-1] - 1)) + 1
+    sequence = numpy.where(number > 0, numpy.maximum(ascending, descending), 0)
+
+    # one pair lookup table per walk step - every row here is non-empty, so the shortest walk is 1
+    tables = _walk_tables()
+    walk = numpy.max([_longest_true_run(table[codes[:, :-1], codes[:, 1:]]) for table in tables], axis=0) + 1
+
+    mixed_case = ((lower > 0) & (upper > 0)).tolist()
+    columns = zip(lengths.tolist(), mixed_case, number.tolist(), special.tolist(), non_ascii.tolist(),
+                  repeating.tolist(), sequence.tolist(), walk.tolist(), nonzero)
+    for position, (length, mixed, numbers, specials, non_asciis, runs, sequences, walks, counts) in zip(rows, columns):
+        entropy = 0
+        for count in counts.tolist():
+            p_x = float(count) / length
+            entropy += - p_x * math.log(p_x, 2)
+        results[position] = {
+            'length': length,
+            'mixed_case': mixed,
+            'number': numbers,
+            'special': specials,
+            'non_ascii': non_asciis,
+            'entropy': round(entropy, 1),
+            'repeating': runs,
+            'sequence': sequences,
+            'walk': walks
+        }
+    return results
+
+
+_walk_lookup = None
+
+
+def _walk_tables():
+    global _walk_lookup
+    if _walk_lookup is None:
+        from .phrasemetrics import _walk_steps
+        count = max(step for steps in _walk_steps.values() for step in steps) + 1
+        _walk_lookup = numpy.zeros((count, 128, 128), dtype=bool)
+        for (first, second), steps in _walk_steps.items():
+            for step in steps:
+                _walk_lookup[step, ord(first), ord(second)] = True
+    return _walk_lookup
+
+
+def _load_numpy():
+    global numpy
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_worker_dictionary = None
+
+
+def init_worker(compared_to):
+    # runs once per pool process, so the dictionary is shipped (and indexed) once per worker
+    global _worker_dictionary
+    _worker_dictionary = compared_to
+
+
+def dictionary_metrics(phrase, compared_to=None):
+    from .phrasemetrics import Metrics
+    if compared_to is None:
+        compared_to = _worker_dictionary
+    return Metrics.similarity(phrase, compared_to), Metrics.contains(phrase, compared_to)
+
+
+def _longest_true_run(flags):
+    """
+    Length of the longest run of consecutive True values in each row of a 2d boolean array.
+    """
+    if flags.shape[1] == 0:
+        return numpy.zeros(flags.shape[0], dtype=numpy.int64)
+    counts = numpy.cumsum(flags, axis=1)
+    # the count at the last False before each position, carried forward
+    resets = numpy.maximum.accumulate(numpy.where(flags, 0, counts), axis=1)
+    return (counts - resets).max(axis=1)
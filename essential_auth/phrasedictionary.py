@@ -0,0 +1,143 @@
+import hashlib
+import mmap
+import struct
+
+
+class PhraseDictionary:
+    """
+    Read only dictionary of phrases (a breached password list, say) compiled into a sorted binary
+    file and memory-mapped. Opening one costs the same whatever its size, and the pages are shared
+    by every process that maps the file.
+
+    Layout: a header, an optional Bloom filter, a table of count + 1 offsets, then the UTF-8 words
+    back to back in byte order. Membership is a Bloom filter probe followed by a binary search.
+
+    Compile once with PhraseDictionary.compile(words_or_path, target) - duplicate and empty entries
+    are dropped.
+
+    Similarity needs every entry indexed in memory, which defeats keeping the corpus off the heap, so
+    it is refused (ValueError) for dictionaries of more than similarity_limit entries. exact and
+    contains search the mapped file and work at any size.
+    """
+
+    magic = b'EADICT1\n'
+    similarity_limit = 100000
+    header = struct.Struct('<8sQQQQ')
+    offset = struct.Struct('<Q')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as dictionary_file:
+            self.map = mmap.mmap(dictionary_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.size, self.max_length, self.bloom_bits, self.bloom_hashes = self.header.unpack_from(self.map, 0)
+        if magic != self.magic:
+            raise ValueError("%s is not a compiled phrase dictionary" % path)
+        self.bloom_start = self.header.size
+        self.offsets_start = self.bloom_start + self.bloom_bits // 8
+        self.data_start = self.offsets_start + (self.size + 1) * self.offset.size
+
+    @staticmethod
+    def compile(source, target, bloom_bits_per_word=10):
+        """
+        Writes the words of source (an iterable of words, or the path of a text file with one per
+        line) to target in PhraseDictionary format. bloom_bits_per_word=0 leaves out the Bloom filter.
+        """
+        if isinstance(source, str):
+            with open(source, encoding='utf-8') as source_file:
+                words = {line.rstrip('\r\n') for line in source_file}
+        else:
+            words = set(source)
+        # the empty string would be "contained" in every phrase
+        words.discard('')
+        encoded = sorted(word.encode('utf-8') for word in words)
+
+        bloom_bits = 0
+        bloom_hashes = 0
+        bloom = bytearray()
+        if bloom_bits_per_word and encoded:
+            bloom_bits = max(64, (len(encoded) * bloom_bits_per_word + 7) // 8 * 8)
+            bloom_hashes = max(1, int(round(bloom_bits_per_word * 0.69)))
+            bloom = bytearray(bloom_bits // 8)
+            for word in encoded:
+                for bit in PhraseDictionary._bloom_positions(word, bloom_bits, bloom_hashes):
+                    bloom[bit >> 3] |= 1 << (bit & 7)
+
+        max_length = max((len(word) for word in words), default=0)
+        with open(target, 'wb') as target_file:
+            target_file.write(PhraseDictionary.header.pack(PhraseDictionary.magic, len(encoded), max_length,
+                                                           bloom_bits, bloom_hashes))
+            target_file.write(bloom)
+            position = 0
+            for word in encoded:
+                target_file.write(PhraseDictionary.offset.pack(position))
+                position += len(word)
+            target_file.write(PhraseDictionary.offset.pack(position))
+            for word in encoded:
+                target_file.write(word)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+        return self._bytes(position).decode('utf-8')
+
+    def __iter__(self):
+        for position in range(self.size):
+            yield self[position]
+
+    def __contains__(self, word):
+        return self._find(word.encode('utf-8'))
+
+    def matches(self, phrase):
+        """
+        Returns the entries found in phrase, in dictionary order - every substring no longer than the
+        longest entry is looked up, so the cost follows the phrase, not the dictionary.
+        """
+        found = set()
+        if self._find(b''):
+            found.add('')
+        for start in range(len(phrase)):
+            for end in range(start + 1, min(len(phrase), start + self.max_length) + 1):
+                part = phrase[start:end]
+                if part not in found and self._find(part.encode('utf-8')):
+                    found.add(part)
+        return sorted(found, key=lambda word: word.encode('utf-8'))
+
+    def count(self, phrase):
+        return len(self.matches(phrase))
+
+    def close(self):
+        self.map.close()
+
+    def __reduce__(self):
+        # pickles as its path - a worker process maps the same file instead of receiving a copy
+        return PhraseDictionary, (self.path,)
+
+    def _bytes(self, position):
+        start, end = struct.unpack_from('<QQ', self.map, self.offsets_start + position * self.offset.size)
+        return self.map[self.data_start + start:self.data_start + end]
+
+    def _find(self, word):
+        if self.bloom_bits:
+            for bit in self._bloom_positions(word, self.bloom_bits, self.bloom_hashes):
+                if not self.map[self.bloom_start + (bit >> 3)] & (1 << (bit & 7)):
+                    return False
+
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(middle) < word:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.size and self._bytes(low) == word
+
+    @staticmethod
+    def _bloom_positions(word, bits, hashes):
+        # double hashing - k positions from the two halves of one digest
+        digest = hashlib.blake2b(word, digest_size=16).digest()
+        first, second = struct.unpack('<QQ', digest)
+        return [(first + i * second) % bits for i in range(hashes)]
@@ -0,0 +1,277 @@
+from collections import Counter, OrderedDict, deque
+import heapq
+import threading
+from .phrasedictionary import PhraseDictionary
+
+
+def _matcher(phrase):
+    # difflib is only imported once a similarity is needed
+    from difflib import SequenceMatcher
+    return SequenceMatcher(None, phrase, '')
+
+
+class SimilarityIndex:
+    """
+    Precomputed index over a dictionary of words that answers "what is the highest
+    SequenceMatcher(None, phrase, word).ratio() over all words" without building a matcher for
+    most of them.
+
+    A ratio is 2*M/(len(phrase)+len(word)), and M can't exceed the size of the two strings'
+    character multiset intersection (difflib's quick_ratio bound, which also covers the length
+    bound). An inverted index from character to (word, count) gives that intersection for every
+    word sharing a character with the phrase in one pass. Words are then matched in order of their
+    bound until the bound can no longer beat the best ratio found - words sharing no character have
+    a ratio of 0 and are never looked at.
+
+    Results are exactly those of the brute force max.
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.lengths = [len(word) for word in self.words]
+        self.has_empty = '' in self.words
+        self.postings = {}
+        for position, word in enumerate(self.words):
+            for char, count in Counter(word).items():
+                self.postings.setdefault(char, []).append((position, count))
+
+    def __len__(self):
+        return len(self.words)
+
+    def best_ratio(self, phrase, shared=None):
+        """
+        shared, if the caller keeps it up to date (see PhraseMeter), is what shared_counts(phrase) returns.
+        """
+        if not self.words:
+            return 0.0
+        if not phrase:
+            # difflib rates two empty strings 1.0, anything else against '' 0.0
+            return 1.0 if self.has_empty else 0.0
+
+        candidates = self._candidates(phrase, shared)
+        matcher = _matcher(phrase)
+        best = 0.0
+        while candidates:
+            bound, position = heapq.heappop(candidates)
+            if -bound <= best:
+                break
+            matcher.set_seq2(self.words[position])
+            best = max(best, matcher.ratio())
+        return best
+
+    def exceeds(self, phrase, threshold):
+        """
+        Same as best_ratio(phrase) > threshold, but stops at the first word over threshold and never
+        matches a word whose bound is at or under it.
+        """
+        if not self.words:
+            return 0.0 > threshold
+        if not phrase:
+            return (1.0 if self.has_empty else 0.0) > threshold
+
+        candidates = self._candidates(phrase)
+        matcher = _matcher(phrase)
+        while candidates:
+            bound, position = heapq.heappop(candidates)
+            if -bound <= threshold:
+                break
+            matcher.set_seq2(self.words[position])
+            if matcher.ratio() > threshold:
+                return True
+        return 0.0 > threshold
+
+    def shared_counts(self, phrase):
+        """
+        Size of the character multiset intersection of phrase and each word sharing a character with it.
+        """
+        shared = {}
+        for char, count in Counter(phrase).items():
+            for position, word_count in self.postings.get(char, ()):
+                shared[position] = shared.get(position, 0) + (word_count if word_count < count else count)
+        return shared
+
+    def _candidates(self, phrase, shared=None):
+        if shared is None:
+            shared = self.shared_counts(phrase)
+
+        # same arithmetic as difflib's ratio, so bounds and ratios compare exactly
+        length, lengths = len(phrase), self.lengths
+        candidates = [(-2.0 * matches / (length + lengths[position]), position) for position, matches in shared.items()]
+        heapq.heapify(candidates)
+        return candidates
+
+
+class ContainsMatcher:
+    """
+    Aho-Corasick automaton over a dictionary of words. One linear pass over a phrase finds every
+    word it contains, however many words there are.
+
+    Words that appear more than once in the dictionary are reported (and counted) once per entry,
+    in dictionary order - the same as [word for word in words if word in phrase].
+    """
+
+    def __init__(self, words):
+        self.positions = {}
+        for position, word in enumerate(words):
+            self.positions.setdefault(word, []).append(position)
+        self.words = list(words)
+
+        # node 0 is the root - goto transitions, failure links, the word ending at each node and the
+        # nearest node down the failure chain that has a word (so outputs are found without walking it)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        self.output_link = [None]
+
+        for word in self.positions:
+            if not word:
+                continue
+            node = 0
+            for char in word:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.output_link.append(None)
+                node = next_node
+            self.output[node] = word
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                link = self.fail[child]
+                self.output_link[child] = link if self.output[link] is not None else self.output_link[link]
+
+    def __len__(self):
+        return len(self.words)
+
+    def matches(self, phrase):
+        """
+        Returns the dictionary entries found in phrase.
+        """
+        positions = sorted(position for word in self._found(phrase) for position in self.positions[word])
+        return [self.words[position] for position in positions]
+
+    def count(self, phrase):
+        return sum(len(self.positions[word]) for word in self._found(phrase))
+
+    def advance(self, node, char, found):
+        """
+        Feeds one character to the automaton from node. Returns the next node and the words it newly
+        adds to found (which it updates) - so a phrase can be matched a character at a time.
+        """
+        goto, output, output_link = self.goto, self.output, self.output_link
+        while node and char not in goto[node]:
+            node = self.fail[node]
+        node = goto[node].get(char, 0)
+
+        # a word already found means the rest of its failure chain was walked then
+        added = []
+        match = node if output[node] is not None else output_link[node]
+        while match is not None and output[match] not in found:
+            found.add(output[match])
+            added.append(output[match])
+            match = output_link[match]
+        return node, added
+
+    def _found(self, phrase):
+        found = set()
+        if '' in self.positions:
+            found.add('')
+
+        goto, fail, output, output_link = self.goto, self.fail, self.output, self.output_link
+        visited = set()
+        node = 0
+        for char in phrase:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            # walk the outputs down the failure chain, stopping where an earlier walk already went
+            match = node if output[node] is not None else output_link[node]
+            while match is not None and match not in visited:
+                visited.add(match)
+                found.add(output[match])
+                match = output_link[match]
+        return found
+
+
+def _cached(cache, words, index_class):
+    # keyed by the words themselves, so an equal list built per call still hits and one changed in
+    # place never does - and only the last _cache_size dictionaries are kept
+    if isinstance(words, index_class):
+        return words
+    if isinstance(words, (tuple, frozenset, PhraseDictionary)):
+        key = words
+    elif isinstance(words, (set, dict)):
+        key = frozenset(words)
+    else:
+        key = tuple(words)
+    with _cache_lock:
+        index = cache.get(key)
+        if index is not None:
+            cache.move_to_end(key)
+            return index
+    index = index_class(key)
+    with _cache_lock:
+        cache[key] = index
+        while len(cache) > _cache_size:
+            cache.popitem(last=False)
+    return index
+
+
+_cache_size = 8
+_cache_lock = threading.Lock()
+_similarity_indexes = OrderedDict()
+_contains_matchers = OrderedDict()
+_exact_sets = OrderedDict()
+
+
+def similarity_index(words):
+    """
+    Returns the SimilarityIndex for words, built on first use and cached with the few dictionaries
+    used most recently. Checking the cache costs a pass over words - hold on to a SimilarityIndex and
+    pass that instead where it matters.
+
+    Raises ValueError for a PhraseDictionary of more than its similarity_limit entries.
+    """
+    if not similarity_allowed(words):
+        raise ValueError("%s has %d entries, similarity is limited to %d"
+                         % (words.path, len(words), words.similarity_limit))
+    return _cached(_similarity_indexes, words, SimilarityIndex)
+
+
+def similarity_allowed(words):
+    """
+    False for a PhraseDictionary too large for similarity_index, True for anything else.
+    """
+    return not (isinstance(words, PhraseDictionary) and len(words) > words.similarity_limit)
+
+
+def contains_matcher(words):
+    """
+    Returns the ContainsMatcher for words, cached the same way as similarity_index. A PhraseDictionary
+    is its own matcher.
+    """
+    if isinstance(words, PhraseDictionary):
+        return words
+    return _cached(_contains_matchers, words, ContainsMatcher)
+
+
+def exact_set(words):
+    """
+    Returns a container for exact lookups in words - a cached frozenset, or the PhraseDictionary itself.
+    """
+    if isinstance(words, PhraseDictionary):
+        return words
+    return _cached(_exact_sets, words, frozenset)
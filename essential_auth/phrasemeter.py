@@ -0,0 +1,232 @@
+import math
+from .phrasemetrics import Metrics, common_passwords, _char_classes, _printable_order, _walk_steps, _LOWER, _UPPER, _DIGIT, _PUNCTUATION
+from .phraseindex import ContainsMatcher, similarity_index, contains_matcher
+
+
+class PhraseMeter:
+    """
+    PhraseMetrics.metrics for a phrase that is being typed. Edits update the metrics instead of
+    recomputing them, metrics() returns exactly what PhraseMetrics.metrics(meter.phrase) would.
+
+    - character class counts and the entropy histogram are counters, updated per character edited
+    - runs, digit sequences and walks keep one state per position, so appending or deleting at the end
+      costs O(1) and an edit in the middle only replays the characters after it
+    - similarity keeps the dictionary's candidate bounds (SimilarityIndex.shared_counts) up to
+      date, so only the SequenceMatcher pass over the surviving candidates runs when it is read
+    - contains keeps the automaton state of each position, like runs and sequences
+
+    Similarity and contains are only recomputed when read after an edit.
+    """
+
+    def __init__(self, phrase='', compared_to=common_passwords):
+        self.compared_to = compared_to
+        self.index = similarity_index(compared_to)
+        matcher = contains_matcher(compared_to)
+        self.matcher = matcher if isinstance(matcher, ContainsMatcher) else None
+
+        self.chars = []
+        self.histogram = {}
+        self.lower = self.upper = self.number = self.special = self.non_ascii = 0
+
+        # per position: (run, ascending, descending, digit, walks, repeating so far, sequence so far, walk so far)
+        self.states = []
+
+        # per position: the phrase.lower() characters it adds, automaton node after them, words it found
+        self.lowered = []
+        self.lowered_counts = {}
+        self.shared = {}
+        self.nodes = []
+        self.found = set()
+        self.common = 0
+        if self.matcher and '' in self.matcher.positions:
+            self.found.add('')
+            self.common = len(self.matcher.positions[''])
+
+        self.cached = {}
+        self.rated = {}
+        self.append(phrase)
+
+    @property
+    def phrase(self):
+        return ''.join(self.chars)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def append(self, text):
+        self.replace(len(self.chars), len(self.chars), text)
+
+    def insert(self, position, text):
+        self.replace(position, position, text)
+
+    def delete(self, start, end=None):
+        """
+        Deletes phrase[start:end], just the character at start if end is omitted.
+        """
+        self.replace(start, start + 1 if end is None else end, '')
+
+    def backspace(self, count=1):
+        self.delete(max(0, len(self.chars) - count), len(self.chars))
+
+    def replace(self, start, end, text):
+        """
+        Replaces phrase[start:end] with text - every other edit is one of these.
+        """
+        start, end, _ = slice(start, end).indices(len(self.chars))
+        end = max(start, end)
+        if start == end and not text:
+            return
+        self.cached = {}
+
+        for char in self.chars[start:end]:
+            self._count(char, -1)
+        for lowered in self.lowered[start:end]:
+            for char in lowered:
+                self._share(char, -1)
+        for char in text:
+            self._count(char, 1)
+
+        # positional state after start is replayed
+        tail = self.chars[end:]
+        del self.chars[start:]
+        del self.states[start:]
+        del self.lowered[start:]
+        for added in self.nodes[start:]:
+            for word in added[1]:
+                self.found.discard(word)
+                self.common -= len(self.matcher.positions[word])
+        del self.nodes[start:]
+
+        for char in text:
+            lowered = char.lower()
+            for lower in lowered:
+                self._share(lower, 1)
+            self._follow(char, lowered)
+        for char in tail:
+            self._follow(char, char.lower())
+
+    def metrics(self):
+        length = len(self.chars)
+        entropy = 0
+        if length:
+            for char in sorted((char for char in self.histogram if char in _printable_order), key=_printable_order.get):
+                p_x = float(self.histogram[char]) / length
+                entropy += - p_x * math.log(p_x, 2)
+            entropy = round(entropy, 1)
+        repeating, sequence, walk = self.states[-1][5:] if self.states else (0, 0, 0)
+
+        return {
+            'length': length,
+            'mixed_case': self.lower > 0 and self.upper > 0,
+            'number': self.number,
+            'special': self.special,
+            'non_ascii': self.non_ascii,
+            'entropy': entropy,
+            'repeating': repeating,
+            'sequence': sequence,
+            'walk': walk,
+            'similarity': self.similarity(),
+            'common': self.contains()
+        }
+
+    def similarity(self):
+        if 'similarity' not in self.cached:
+            if 'Σ' in self.histogram:
+                # the only character str.lower() maps by context (final sigma), so lower the whole phrase
+                self.cached['similarity'] = Metrics.similarity(self.phrase, self.compared_to)
+            else:
+                # backspacing returns to phrases already rated
+                phrase = ''.join(self.lowered)
+                if phrase not in self.rated:
+                    if len(self.rated) >= 64:
+                        self.rated.clear()
+                    self.rated[phrase] = self.index.best_ratio(phrase, self.shared)
+                self.cached['similarity'] = self.rated[phrase]
+        return self.cached['similarity']
+
+    def contains(self):
+        if 'common' not in self.cached:
+            if self.matcher is None or 'Σ' in self.histogram:
+                self.cached['common'] = Metrics.contains(self.phrase, self.compared_to)
+            else:
+                self.cached['common'] = self.common
+        return self.cached['common']
+
+    def _count(self, char, change):
+        self.histogram[char] = self.histogram.get(char, 0) + change
+        if not self.histogram[char]:
+            del self.histogram[char]
+
+        kind = _char_classes.get(char)
+        if kind is None:
+            self.non_ascii += change
+        elif kind == _LOWER:
+            self.lower += change
+        elif kind == _UPPER:
+            self.upper += change
+        elif kind == _DIGIT:
+            self.number += change
+        elif kind == _PUNCTUATION:
+            self.special += change
+
+    def _share(self, char, change):
+        # a word's bound only moves while the phrase has no more of char than the word does
+        count = self.lowered_counts.get(char, 0)
+        if change > 0:
+            count += 1
+        for position, word_count in self.index.postings.get(char, ()):
+            if count <= word_count:
+                matches = self.shared.get(position, 0) + change
+                if matches:
+                    self.shared[position] = matches
+                else:
+                    del self.shared[position]
+        self.lowered_counts[char] = self.lowered_counts.get(char, 0) + change
+        if not self.lowered_counts[char]:
+            del self.lowered_counts[char]
+
+    def _follow(self, char, lowered):
+        # the same run and sequence rules as Metrics.scan, from the state of the previous position
+        if self.states:
+            run, ascending, descending, digit, walks, repeating, sequence, walk = self.states[-1]
+            previous = self.chars[-1]
+        else:
+            run = ascending = descending = repeating = sequence = walk = 0
+            digit = previous = None
+            walks = {}
+
+        run = run + 1 if char == previous and char != '\n' else 1
+        if run > 1 and run > repeating:
+            repeating = run
+
+        kind = _char_classes.get(char)
+        if kind == _DIGIT or (kind is None and char.isdecimal()):
+            value = int(char)
+            ascending = ascending + 1 if digit is not None and value == digit + 1 else 1
+            descending = descending + 1 if digit is not None and value == digit - 1 else 1
+            sequence = max(sequence, ascending, descending)
+            digit = value
+        else:
+            digit = None
+
+        steps = _walk_steps.get((previous, char))
+        if steps:
+            walks = {step: walks.get(step, 1) + 1 for step in steps}
+            walk = max(walk, max(walks.values()))
+        else:
+            walks = {}
+            walk = walk or 1
+
+        self.chars.append(char)
+        self.states.append((run, ascending, descending, digit, walks, repeating, sequence, walk))
+        self.lowered.append(lowered)
+
+        node = self.nodes[-1][0] if self.nodes else 0
+        added = []
+        if self.matcher:
+            for lower in lowered:
+                node, found = self.matcher.advance(node, lower, self.found)
+                added.extend(found)
+            for word in added:
+                self.common += len(self.matcher.positions[word])
+        self.nodes.append((node, added))
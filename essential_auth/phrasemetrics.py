@@ -1,10 +1,8 @@
-from operator import itemgetter
-from itertools import groupby
 import string
 import math
 import re
-import unittest
-from difflib import SequenceMatcher
+from .phraseindex import similarity_index, contains_matcher, exact_set
+from . import phrasebatch
 
 
 
@@ -130,6 +128,7 @@ class PhraseMetrics:
     more_entropy = 'more complexity'
     repeating = 'too many repeating characters (AAA, @@@ etc)'
     sequence = 'too many sequences (123, 654, etc)'
+    walk = 'too many keyboard or alphabet walks (qwerty, abcd, etc)'
     non_ascii = 'has non-ascii characters'
 
     @staticmethod
@@ -137,22 +136,50 @@ class PhraseMetrics:
         """
 
         """
-        return {
-            'length': len(phrase),
-            'mixed_case': Metrics.case_mix(phrase),
-            'number': Metrics.number(phrase),
-            'special': Metrics.special(phrase),
-            'non_ascii': Metrics.non_ascii(phrase),
-            'entropy': Metrics.entropy(phrase),
-            'repeating': Metrics.repeats(phrase),
-            'sequence': Metrics.sequences(phrase),
-            'similarity': Metrics.similarity(phrase),
-            'common': Metrics.contains(phrase)
-        }
+        results = Metrics.scan(phrase)
+        results['similarity'] = Metrics.similarity(phrase)
+        results['common'] = Metrics.contains(phrase)
+        return results
+
+    @staticmethod
+    def metrics_many(phrases, compared_to=None, chunk_size=1000, processes=None):
+        """
+        Yields PhraseMetrics.metrics for every phrase of an iterable, holding only chunk_size phrases
+        at a time. The cheap metrics of a chunk are computed together (vectorised when NumPy is
+        installed), similarity and contains can be fanned out over a pool of processes.
+        """
+        if compared_to is None:
+            compared_to = common_passwords
+        pool = None
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(processes, initializer=phrasebatch.init_worker, initargs=(compared_to,))
+        try:
+            for chunk in phrasebatch.chunks(phrases, chunk_size):
+                if pool:
+                    dictionary = pool.map(phrasebatch.dictionary_metrics, chunk,
+                                          chunksize=max(1, len(chunk) // (processes * 4)))
+                else:
+                    dictionary = (phrasebatch.dictionary_metrics(phrase, compared_to) for phrase in chunk)
+                for results, (similarity, common) in zip(phrasebatch.scan_chunk(chunk), dictionary):
+                    results['similarity'] = similarity
+                    results['common'] = common
+                    yield results
+        finally:
+            if pool:
+                pool.shutdown()
+
+    @staticmethod
+    def rules_many(phrases, compared_to=None, chunk_size=1000, processes=None, **rules):
+        """
+        Yields PhraseMetrics.rules(metrics, **rules) for every phrase of an iterable.
+        """
+        for metrics in PhraseMetrics.metrics_many(phrases, compared_to, chunk_size, processes):
+            yield PhraseMetrics.rules(metrics, **rules)
 
     @staticmethod
     def rules(metrics, min_len=8, mix_case=True, number=1, spacial=1,
-              max_repeating=2, max_sequence=2, ascii_only=True, min_entropy=2.5, max_similarity=.8):
+              max_repeating=2, max_sequence=2, ascii_only=True, min_entropy=2.5, max_similarity=.8, max_walk=None):
 
         issues = []
         if metrics['length'] < min_len:
@@ -167,6 +194,8 @@ class PhraseMetrics:
             issues.append(PhraseMetrics.repeating)
         if max_sequence and metrics['sequence'] > max_sequence:
             issues.append(PhraseMetrics.sequence)
+        if max_walk and metrics['walk'] > max_walk:
+            issues.append(PhraseMetrics.walk)
         if ascii_only and metrics['non_ascii']:
             issues.append(PhraseMetrics.non_ascii)
         if min_entropy and metrics['entropy'] < min_entropy:
@@ -176,8 +205,115 @@ class PhraseMetrics:
 
         return issues
 
+# character classes for Metrics.scan - anything missing from the table is not printable ascii
+_LOWER, _UPPER, _DIGIT, _PUNCTUATION, _OTHER = range(5)
+_char_classes = dict.fromkeys(string.printable, _OTHER)
+_char_classes.update(dict.fromkeys(string.ascii_lowercase, _LOWER))
+_char_classes.update(dict.fromkeys(string.ascii_uppercase, _UPPER))
+_char_classes.update(dict.fromkeys(string.digits, _DIGIT))
+_char_classes.update(dict.fromkeys(string.punctuation, _PUNCTUATION))
+_printable_order = {char: position for position, char in enumerate(string.printable)}
+
+# walk tables for Metrics.walks - ordered character pair -> the (table, direction) steps it is part of,
+# an even step id ascends its table, the odd one after it descends
+_keyboard_shift = dict(zip("`1234567890-=[]\\;',./", "~!@#$%^&*()_+{}|:\"<>?"))
+_keyboard_shift.update(zip(string.ascii_lowercase, string.ascii_uppercase))
+_walk_tables = [
+    (["0123456789"], lambda char: (char,)),
+    ([string.ascii_lowercase], lambda char: (char, char.upper())),
+    (["`1234567890-=", "qwertyuiop[]\\", "asdfghjkl;'", "zxcvbnm,./"], lambda char: (char, _keyboard_shift[char])),
+    (["1qaz", "2wsx", "3edc", "4rfv", "5tgb", "6yhn", "7ujm", "8ik,", "9ol.", "0p;/"],
+     lambda char: (char, _keyboard_shift[char]))
+]
+_walk_steps = {}
+for _table, (_sequences, _variants) in enumerate(_walk_tables):
+    for _sequence in _sequences:
+        for _first, _second in zip(_sequence, _sequence[1:]):
+            for _a in _variants(_first):
+                for _b in _variants(_second):
+                    _walk_steps.setdefault((_a, _b), set()).add(_table * 2)
+                    _walk_steps.setdefault((_b, _a), set()).add(_table * 2 + 1)
+_walk_steps = {pair: tuple(sorted(steps)) for pair, steps in _walk_steps.items()}
+
+
 class Metrics:
 
+    @staticmethod
+    def scan(phrase):
+        """
+        Computes length, mixed_case, number, special, non_ascii, entropy, repeating and sequence in a
+        single pass over phrase. The results are identical to the individual Metrics functions.
+        """
+        classes = _char_classes
+        histogram = {}
+        lower = upper = number = special = non_ascii = 0
+        repeating = run = 0
+        sequence = ascending = descending = 0
+        walk, walks = 0, {}
+        previous = previous_digit = None
+
+        for char in phrase:
+            histogram[char] = histogram.get(char, 0) + 1
+
+            kind = classes.get(char)
+            if kind is None:
+                non_ascii += 1
+            elif kind == _LOWER:
+                lower += 1
+            elif kind == _UPPER:
+                upper += 1
+            elif kind == _DIGIT:
+                number += 1
+            elif kind == _PUNCTUATION:
+                special += 1
+
+            # runs of one character, as (.)\1+ finds them - '.' does not match a newline
+            if char == previous and char != '\n':
+                run += 1
+                if run > repeating:
+                    repeating = run
+            else:
+                run = 1
+
+            # walks - each step extends the runs of the tables and directions it steps along
+            steps = _walk_steps.get((previous, char))
+            if steps:
+                walks = {step: walks.get(step, 1) + 1 for step in steps}
+                walk = max(walk, max(walks.values()))
+            else:
+                walks = {}
+            previous = char
+
+            # digit sequences, as \d+ finds digits - any unicode decimal
+            if kind == _DIGIT or (kind is None and char.isdecimal()):
+                digit = int(char)
+                ascending = ascending + 1 if previous_digit is not None and digit == previous_digit + 1 else 1
+                descending = descending + 1 if previous_digit is not None and digit == previous_digit - 1 else 1
+                sequence = max(sequence, ascending, descending)
+                previous_digit = digit
+            else:
+                previous_digit = None
+
+        # summed in string.printable order, like Metrics.entropy, so the float result is the same
+        entropy = 0
+        if phrase:
+            for char in sorted((char for char in histogram if char in _printable_order), key=_printable_order.get):
+                p_x = float(histogram[char]) / len(phrase)
+                entropy += - p_x * math.log(p_x, 2)
+            entropy = round(entropy, 1)
+
+        return {
+            'length': len(phrase),
+            'mixed_case': lower > 0 and upper > 0,
+            'number': number,
+            'special': special,
+            'non_ascii': non_ascii,
+            'entropy': entropy,
+            'repeating': repeating,
+            'sequence': sequence,
+            'walk': walk or min(len(phrase), 1)
+        }
+
     @staticmethod
     def case_mix(phrase):
         return any( n in phrase for n in string.ascii_lowercase ) and any( n in phrase for n in string.ascii_uppercase )
@@ -223,28 +359,68 @@ class Metrics:
 
     @staticmethod
     def sequences(phrase):
-        seqs = []
-        for num in re.findall('\d+', phrase):
-            data = [int(digit) for digit in num]
-            #forward sequences
-            for key, group in groupby(enumerate(data), lambda i: i[0] - i[1]):
-                seqs.append(len(list(map(itemgetter(1), group))))
-
-            for key, group in groupby(enumerate(data), lambda i: i[0] + i[1]):
-                seqs.append(len(list(map(itemgetter(1), group))))
-        if len(seqs):
-            return max(seqs)
-        else:
-            return 0
+        """
+        Longest run of ascending or descending digits (123, 654) - any unicode decimal counts.
+        """
+        sequence = ascending = descending = 0
+        previous = None
+        for char in phrase:
+            if char.isdecimal():
+                digit = int(char)
+                ascending = ascending + 1 if previous is not None and digit == previous + 1 else 1
+                descending = descending + 1 if previous is not None and digit == previous - 1 else 1
+                sequence = max(sequence, ascending, descending)
+                previous = digit
+            else:
+                previous = None
+        return sequence
+
+    @staticmethod
+    def walks(phrase):
+        """
+        Longest ascending or descending walk along the digits (234), the alphabet (abcd, zyx), a
+        keyboard row (qwerty, poiu, asdf) or a keyboard column (1qaz, zaq) - case and shift are
+        ignored on the keyboard. 1 when there is no walk, 0 for an empty phrase.
+        """
+        walk, walks = 0, {}
+        previous = None
+        for char in phrase:
+            steps = _walk_steps.get((previous, char))
+            if steps:
+                walks = {step: walks.get(step, 1) + 1 for step in steps}
+                walk = max(walk, max(walks.values()))
+            else:
+                walks = {}
+            previous = char
+        return walk or min(len(phrase), 1)
+
+    @staticmethod
+    def exact(phrase, compared_to=common_passwords):
+        """
+        True if phrase is an entry of compared_to (a list or a PhraseDictionary).
+        """
+        return phrase.lower() in exact_set(compared_to)
 
     @staticmethod
     def similarity(phrase, compared_to=common_passwords):
-        return max([SequenceMatcher(None, phrase.lower(), c).ratio() for c in compared_to])
+        """
+        Highest difflib ratio between phrase and any entry of compared_to (a list, a SimilarityIndex or
+        a PhraseDictionary of at most PhraseDictionary.similarity_limit entries, indexed in memory on
+        first use).
+        """
+        return similarity_index(compared_to).best_ratio(phrase.lower())
 
     @staticmethod
     def contains(phrase, compared_to=common_passwords):
-        return len([c for c in compared_to if c in phrase.lower()])
+        """
+        Number of entries of compared_to (a list, a ContainsMatcher or a PhraseDictionary) found in phrase.
+        """
+        return contains_matcher(compared_to).count(phrase.lower())
 
+    @staticmethod
+    def contained(phrase, compared_to=common_passwords):
+        """
+        The entries of compared_to found in phrase.
+        """
+        return contains_matcher(compared_to).matches(phrase.lower())
 
-if __name__ == '__main__':
-    unittest.main()
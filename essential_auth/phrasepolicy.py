@@ -0,0 +1,129 @@
+from .phrasemetrics import Metrics, PhraseMetrics, common_passwords
+from .phraseindex import similarity_index, similarity_allowed, exact_set
+
+
+class LazyMetrics(dict):
+    """
+    The PhraseMetrics.metrics dict of one phrase, computed on first access - length is free, the
+    cheap metrics all come from one Metrics.scan, exact, similarity and common are only computed when asked for.
+    """
+
+    def __init__(self, phrase, compared_to=common_passwords):
+        super().__init__()
+        self.phrase = phrase
+        self.compared_to = compared_to
+
+    def __missing__(self, key):
+        if key == 'length':
+            self[key] = len(self.phrase)
+        elif key == 'exact':
+            self[key] = Metrics.exact(self.phrase, self.compared_to)
+        elif key == 'similarity':
+            # an exact entry rates 1.0 - a set lookup instead of a similarity search
+            if self['exact']:
+                self[key] = 1.0
+            else:
+                self[key] = Metrics.similarity(self.phrase, self.compared_to)
+        elif key == 'common':
+            self[key] = Metrics.contains(self.phrase, self.compared_to)
+        else:
+            scanned = Metrics.scan(self.phrase)
+            if key not in scanned:
+                raise KeyError(key)
+            self.update(scanned)
+        return dict.__getitem__(self, key)
+
+    def similarity_over(self, threshold):
+        """
+        metrics['similarity'] > threshold, without the full best ratio search when it isn't known yet.
+        """
+        if 'similarity' not in self:
+            if self['exact']:
+                self['similarity'] = 1.0
+            else:
+                return similarity_index(self.compared_to).exceeds(self.phrase.lower(), threshold)
+        return self['similarity'] > threshold
+
+
+class PhrasePolicy:
+    """
+    PhraseMetrics.rules compiled once for repeated use. Disabled rules are dropped up front and the
+    rest run cheapest first - length, then the single pass scan, then the dictionary - computing only
+    the metrics they need. With fail_fast the check stops at the first violation, so an obviously bad
+    passphrase is rejected without ever reaching the dictionary.
+
+    check() returns the same issues, in the same order, as PhraseMetrics.rules(PhraseMetrics.metrics(phrase))
+    while max_similarity is in use.
+
+    breached reports an exact entry of compared_to as too_common even when similarity is not checked -
+    with max_similarity off, or for a PhraseDictionary of more than its similarity_limit entries,
+    which is screened by exact lookup alone (a Bloom filter probe and a binary search at any size).
+
+    max_walk catches keyboard and alphabet walks (qwerty, 1qaz, abcd) from the scan - with it, a
+    policy can turn max_similarity off and, with breached off too, skip the dictionary altogether.
+    """
+
+    def __init__(self, min_len=8, mix_case=True, number=1, spacial=1, max_repeating=2, max_sequence=2,
+                 ascii_only=True, min_entropy=2.5, max_similarity=.8, max_walk=None, compared_to=common_passwords,
+                 fail_fast=False, breached=True):
+        self.compared_to = compared_to
+        self.fail_fast = fail_fast
+        self.similarity = bool(max_similarity) and similarity_allowed(compared_to)
+
+        # (cost, issue, violated) in the order PhraseMetrics.rules reports them
+        checks = []
+        if min_len:
+            checks.append((0, PhraseMetrics.too_short, lambda metrics: metrics['length'] < min_len))
+        if mix_case:
+            checks.append((1, PhraseMetrics.not_mixed, lambda metrics: not metrics['mixed_case']))
+        if number:
+            checks.append((1, PhraseMetrics.more_numbers, lambda metrics: metrics['number'] < number))
+        if spacial:
+            checks.append((1, PhraseMetrics.more_special, lambda metrics: metrics['special'] < spacial))
+        if max_repeating:
+            checks.append((1, PhraseMetrics.repeating, lambda metrics: metrics['repeating'] > max_repeating))
+        if max_sequence:
+            checks.append((1, PhraseMetrics.sequence, lambda metrics: metrics['sequence'] > max_sequence))
+        if max_walk:
+            checks.append((1, PhraseMetrics.walk, lambda metrics: metrics['walk'] > max_walk))
+        if ascii_only:
+            checks.append((1, PhraseMetrics.non_ascii, lambda metrics: metrics['non_ascii'] > 0))
+        if min_entropy:
+            checks.append((1, PhraseMetrics.more_entropy, lambda metrics: metrics['entropy'] < min_entropy))
+        if self.similarity:
+            checks.append((2, PhraseMetrics.too_common, lambda metrics: metrics.similarity_over(max_similarity)))
+        elif breached:
+            checks.append((2, PhraseMetrics.too_common, lambda metrics: metrics['exact']))
+
+        # stable, so checks of the same cost keep the PhraseMetrics.rules order
+        checks.sort(key=lambda check: check[0])
+        self.checks = [(issue, violated) for cost, issue, violated in checks]
+
+    def prepare(self):
+        """
+        Builds the dictionary structures the policy needs now rather than on the first check.
+        """
+        if any(issue == PhraseMetrics.too_common for issue, violated in self.checks):
+            exact_set(self.compared_to)
+            if self.similarity:
+                similarity_index(self.compared_to)
+        return self
+
+    def check(self, phrase, fail_fast=None):
+        """
+        Returns the list of issues with phrase, empty if it passes. fail_fast overrides the policy
+        default - when set, at most the first (cheapest) issue is returned.
+        """
+        if fail_fast is None:
+            fail_fast = self.fail_fast
+        metrics = LazyMetrics(phrase, self.compared_to)
+        issues = []
+        for issue, violated in self.checks:
+            if violated(metrics):
+                issues.append(issue)
+                if fail_fast:
+                    break
+        return issues
+
+    def passes(self, phrase):
+        return not self.check(phrase, fail_fast=True)
@@ -0,0 +1,65 @@
+import atexit
+import os
+import threading
+from .essentialauth import EssentialAuth, EssentialTropicsStorage, PBKDF2Hash
+
+_instances = {}
+_lock = threading.Lock()
+_registered = False
+
+
+def _frozen(value):
+    # a hashable stand in for a config value - objects (a PhrasePolicy say) are compared by identity
+    if isinstance(value, dict):
+        return tuple(sorted((key, _frozen(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value).__name__, tuple(_frozen(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        return id(value)
+    return value
+
+
+def shared_auth(config=None, store_class=EssentialTropicsStorage, hash_class=PBKDF2Hash):
+    """
+    Returns the process-wide EssentialAuth for config's db_location (config is merged over the
+    defaults). The first call opens it, later calls with an equal config, store_class and hash_class
+    get the same instance back - use this in place of constructing EssentialAuth per request or per
+    job. Every shared instance is closed when the process exits, or by close_all().
+
+    Raises:
+        ValueError if db_location is already open with a different config, store_class or hash_class -
+        two instances over one file would overwrite each other's writes.
+    """
+    global _registered
+    settings = EssentialAuth.default_config.copy()
+    settings.update(config or {})
+    location = os.path.abspath(settings['db_location'])
+    opened_with = (store_class, hash_class, _frozen(dict(settings, db_location=location)))
+
+    with _lock:
+        entry = _instances.get(location)
+        if entry is None:
+            entry = (opened_with, EssentialAuth(settings, store_class, hash_class))
+            _instances[location] = entry
+            if not _registered:
+                atexit.register(close_all)
+                _registered = True
+        elif entry[0] != opened_with:
+            raise ValueError("%s is already open with a different config, store_class or hash_class"
+                             % settings['db_location'])
+        return entry[1]
+
+
+def close_all():
+    """
+    Closes (stops background work, flushes and closes the stores and the hasher) every shared
+    instance and forgets them, so the next shared_auth call opens afresh.
+    """
+    with _lock:
+        instances = [auth for opened_with, auth in _instances.values()]
+        _instances.clear()
+    for auth in instances:
+        auth.close()
+    return len(instances)
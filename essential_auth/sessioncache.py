@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+
+
+class SessionCache:
+    """
+    Bounded LRU cache of (session, profile) pairs keyed by session token. Each entry also expires at
+    the session's own idle/absolute deadline, so a cached session never outlives the stored one.
+    """
+
+    def __init__(self, size=10000, idle_timeout=None, absolute_timeout=None):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+        self.entries = OrderedDict()
+        self.by_profile = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def deadline(self, session):
+        deadlines = []
+        if self.idle_timeout:
+            deadlines.append(session['last_seen'] + timedelta(seconds=self.idle_timeout))
+        if self.absolute_timeout:
+            deadlines.append(session['started'] + timedelta(seconds=self.absolute_timeout))
+        return min(deadlines) if deadlines else None
+
+    def get(self, token):
+        now = datetime.now()
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            session, profile, deadline = entry
+            if deadline is not None and now >= deadline:
+                self._discard(token)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return session, profile
+
+    def put(self, token, session, profile):
+        with self.lock:
+            self._discard(token)
+            self.entries[token] = (session, profile, self.deadline(session))
+            self.by_profile.setdefault(profile['_id'], set()).add(token)
+            while len(self.entries) > self.size:
+                self._discard(next(iter(self.entries)))
+
+    def invalidate(self, token):
+        with self.lock:
+            return self._discard(token)
+
+    def invalidate_profile(self, profile_id):
+        with self.lock:
+            tokens = list(self.by_profile.get(profile_id, ()))
+            for token in tokens:
+                self._discard(token)
+            return len(tokens)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_profile.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+    def _discard(self, token):
+        entry = self.entries.pop(token, None)
+        if entry is None:
+            return False
+        profile_id = entry[1]['_id']
+        tokens = self.by_profile.get(profile_id)
+        if tokens:
+            tokens.discard(token)
+            if not tokens:
+                del self.by_profile[profile_id]
+        return True
@@ -0,0 +1,105 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSweeper:
+    """
+    Removes expired sessions that nobody comes back to validate. Session deadlines (the earlier of
+    last_seen + idle_timeout and started + absolute_timeout) are kept in a wheel of time buckets
+    'bucket_seconds' wide, so a sweep only looks at sessions whose bucket has come due.
+
+    Touching a session does not reschedule it - when its bucket comes due a session that is still
+    alive is simply moved to the bucket of its new deadline.
+    """
+
+    def __init__(self, store, idle_timeout=None, absolute_timeout=None, bucket_seconds=60, batch_size=1000):
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+        self.bucket_seconds = bucket_seconds
+        self.batch_size = batch_size
+        self.buckets = {}
+        self.reclaimed = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def deadline(self, session):
+        deadlines = []
+        if self.idle_timeout:
+            deadlines.append(session['last_seen'] + timedelta(seconds=self.idle_timeout))
+        if self.absolute_timeout:
+            deadlines.append(session['started'] + timedelta(seconds=self.absolute_timeout))
+        return min(deadlines) if deadlines else None
+
+    def schedule(self, session):
+        deadline = self.deadline(session)
+        if deadline is None:
+            return
+        with self.lock:
+            self.buckets.setdefault(self._bucket(deadline), set()).add(session['_id'])
+
+    def build(self):
+        with self.lock:
+            self.buckets = {}
+        for session in self.store.sessions():
+            self.schedule(session)
+
+    def sweep(self, now=None):
+        """
+        Removes the expired sessions of every bucket that has come due, 'batch_size' sessions per
+        store write. Returns the number of sessions reclaimed. If the store fails, the sessions of
+        the due buckets are put back to be tried by the next sweep.
+        """
+        now = now or datetime.now()
+        with self.lock:
+            due = [key for key in self.buckets if key <= self._bucket(now)]
+            tokens = [token for key in due for token in self.buckets.pop(key)]
+
+        reclaimed = 0
+        try:
+            expired = []
+            for token in tokens:
+                session = self.store.session(token=token)
+                if not session:
+                    continue
+                deadline = self.deadline(session)
+                if deadline is not None and deadline <= now:
+                    expired.append(token)
+                else:
+                    self.schedule(session)
+
+            for start in range(0, len(expired), self.batch_size):
+                reclaimed += self.store.remove_sessions(expired[start:start + self.batch_size])
+        except Exception:
+            with self.lock:
+                self.buckets.setdefault(self._bucket(now), set()).update(tokens)
+            raise
+        finally:
+            self.reclaimed += reclaimed
+        return reclaimed
+
+    def start(self, interval):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self, interval):
+        while not self.stopped.wait(interval):
+            try:
+                self.sweep()
+            except Exception:
+                # a failed sweep must not end the thread, or nothing is ever reclaimed again
+                logger.exception("Session sweep failed")
+
+    def _bucket(self, deadline):
+        return int(deadline.timestamp() // self.bucket_seconds)
@@ -0,0 +1,172 @@
+import fcntl
+import os
+import pickle
+from contextlib import contextmanager
+from datetime import datetime
+from essentialdb import Collection
+from .essentialauth import EssentialTropicsStorage
+
+
+def _signature(stat):
+    # a replaced file differs in at least one of these, even within the resolution of mtime
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _newer(document, field, value):
+    current = document.get(field)
+    return current is None or value is None or current <= value
+
+
+class SharedTropicsStorage(EssentialTropicsStorage):
+    """
+    EssentialTropicsStorage for several processes sharing one db_location - gunicorn workers say.
+    Pass store_class=SharedTropicsStorage.
+
+    Each collection is kept in a file of its own next to db_location (tropics.db.sessions and so
+    on). A write takes an exclusive lock on tropics.db.lock, reloads its collection if another
+    process has changed it, makes the change and replaces the file - so writes from different
+    workers add up rather than the last one winning.
+
+    Reads are still served from memory, but each one stats its collection's file first and reloads
+    the collection if the file has been replaced: a session started in one worker validates in the
+    others, and the profiles are not read again until a profile changes.
+
+    Touches and staged credentials are held in memory, outlive those reloads and are written by
+    sync(). Touch mode and a SessionCache are per process - another worker would expire a session
+    on a last_seen held here, or an ended session would stay valid in the cache - so EssentialAuth
+    refuses session_touch and session_cache_size with this store.
+
+    Relies on fcntl, so POSIX only. A db_location written by EssentialTropicsStorage is the
+    starting point for every collection that has no file of its own yet.
+    """
+
+    # a read may stat, reload a file or wait on another process's write - see AsyncEssentialAuth
+    in_memory = False
+
+    multi_process = True
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.signatures = {}
+        self.touches = {}
+        self.staged = {}
+        self.lock_file = None
+        self.lock_pid = None
+        super().__init__(filepath)
+        with self.lock:
+            for name in self.indexed_fields:
+                self._refresh(name)
+
+    def stage_credential(self, credential):
+        """
+        Stores credential in memory only - it is persisted by the next sync().
+        """
+        with self.lock:
+            super().stage_credential(credential)
+            self.staged[credential['_id']] = credential
+
+    def touch_session(self, token, last_seen):
+        """
+        Updates last_seen in memory only - it is persisted by the next sync().
+        """
+        with self.lock:
+            session = super().touch_session(token, last_seen)
+            if session:
+                self.touches[token] = last_seen
+        return session
+
+    def sync(self):
+        """
+        Writes the touches and staged credentials held in memory.
+        """
+        with self.lock:
+            if self.touches:
+                with self._writing('sessions'):
+                    self.touches = {}
+            if self.staged:
+                with self._writing('credentials'):
+                    self.staged = {}
+
+    def _path(self, name):
+        return "%s.%s" % (self.filepath, name)
+
+    def _collection(self, name):
+        if self._changed(name):
+            with self.lock:
+                self._refresh(name)
+        return self.db.get_collection(name)
+
+    @contextmanager
+    def _writing(self, name):
+        with self.lock, self._locked():
+            self._refresh(name)
+            collection = self.db.get_collection(name)
+            try:
+                yield collection
+            except BaseException:
+                # the change may be half made - read the file again on next use
+                self.signatures.pop(name, None)
+                raise
+            self._write(name)
+
+    @contextmanager
+    def _locked(self):
+        # flock locks belong to the open file, which a forked worker shares with its parent
+        if self.lock_pid != os.getpid():
+            self.lock_file = open(self.filepath + '.lock', 'ab')
+            self.lock_pid = os.getpid()
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def _changed(self, name):
+        try:
+            return _signature(os.stat(self._path(name))) != self.signatures.get(name)
+        except FileNotFoundError:
+            return False
+
+    def _refresh(self, name):
+        # reloads name if its file has been replaced since we last read or wrote it
+        try:
+            with open(self._path(name), 'rb') as file:
+                signature = _signature(os.fstat(file.fileno()))
+                if signature == self.signatures.get(name):
+                    return
+                documents = pickle.load(file)['documents']
+        except FileNotFoundError:
+            return
+        self.db.collections[name] = Collection(documents, self.db.threading_lock, self.db.sync)
+        self.signatures[name] = signature
+        self.indexes[name] = self._collection_indexes(name)
+        self._reapply(name)
+
+    def _reapply(self, name):
+        # what is held for the next sync() outlives a reload, unless the file has something newer
+        collection = self.db.get_collection(name)
+        if name == 'sessions':
+            for token, last_seen in self.touches.items():
+                session = collection.get(token)
+                if session and _newer(session, 'last_seen', last_seen):
+                    session['last_seen'] = last_seen
+        elif name == 'credentials':
+            for _id, credential in self.staged.items():
+                existing = collection.get(_id)
+                if existing and _newer(existing, 'updated', credential.get('updated')):
+                    self._insert('credentials', collection, credential)
+
+    def _write(self, name):
+        # written aside and renamed over, so a reader sees the old file or the new one, never a part
+        path = self._path(name)
+        written = "%s.%d.tmp" % (path, os.getpid())
+        output = {
+            'meta': {'timestamp': datetime.now()},
+            'documents': self.db.get_collection(name)._get_raw_documents()
+        }
+        with open(written, 'wb') as file:
+            pickle.dump(output, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            signature = _signature(os.fstat(file.fileno()))
+        os.replace(written, path)
+        self.signatures[name] = signature
@@ -0,0 +1,262 @@
+import pickle
+import sqlite3
+import threading
+import uuid
+
+
+def _key(value):
+    # sqlite binds str, int, float and bytes - anything else (a UUID say) is keyed by its str
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    return str(value)
+
+
+class SQLiteStorage:
+    """
+    Storage for EssentialAuth in a SQLite database - pass store_class=SQLiteStorage.
+
+    Each document is one row: the whole document pickled, plus indexed columns for the fields it is
+    looked up by. A write touches its own rows rather than rewriting the database, and the database
+    runs in WAL mode so readers never wait on the writer and several processes can share one file.
+
+    Every thread gets its own connection. The statements are fixed strings, so the sqlite3
+    statement cache prepares each of them once per connection.
+
+    Rehash-on-verify writes and touches (stage_credential, touch_session) are held in memory and
+    written together, in one transaction, by sync(). EssentialAuth refuses touch mode with this
+    store, as another process would expire a session on the last_seen held here.
+    """
+
+    # reads go to the database - see AsyncEssentialAuth
+    in_memory = False
+
+    # several processes can share the database, so EssentialAuth refuses touch mode and a SessionCache
+    multi_process = True
+
+    # collection -> the indexed columns besides _id
+    columns = {
+        'profiles': ('login',),
+        'credentials': ('login',),
+        'sessions': ('login', 'profile_id')
+    }
+
+    def __init__(self, filepath, timeout=30):
+        self.filepath = filepath
+        self.timeout = timeout
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.touches = {}
+        self.staged = {}
+
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            for name, fields in self.columns.items():
+                connection.execute("CREATE TABLE IF NOT EXISTS %s (_id PRIMARY KEY, %s, document BLOB NOT NULL)"
+                                   % (name, ", ".join(fields)))
+                for field in fields:
+                    connection.execute("CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)" % (name, field, name, field))
+
+        self.statements = {}
+        for name, fields in self.columns.items():
+            self.statements[name] = {
+                'get': "SELECT document FROM %s WHERE _id = ?" % name,
+                'all': "SELECT document FROM %s" % name,
+                'put': "INSERT OR REPLACE INTO %s (_id, %s, document) VALUES (?, %s, ?)"
+                       % (name, ", ".join(fields), ", ".join("?" for field in fields)),
+                'delete': "DELETE FROM %s WHERE _id = ?" % name,
+                'clear': "DELETE FROM %s" % name
+            }
+            for field in fields:
+                self.statements[name][field] = "SELECT document FROM %s WHERE %s = ? LIMIT 1" % (name, field)
+        self.statements['credentials']['delete_login'] = "DELETE FROM credentials WHERE login = ?"
+
+    def profile(self, id=None, login=None ):
+        if id:
+            return self._get('profiles', id)
+        if login:
+            return self._find_one('profiles', 'login', login)
+
+    def profiles(self):
+        return self._all('profiles')
+
+    def store_profile(self, profile):
+        with self._connection() as connection:
+            return self._put(connection, 'profiles', profile)
+
+    def store_profiles(self, profiles):
+        with self._connection() as connection:
+            for profile in profiles:
+                self._put(connection, 'profiles', profile)
+            return True
+
+    def remove_profile(self, profile_id):
+        with self._connection() as connection:
+            return connection.execute(self.statements['profiles']['delete'], (_key(profile_id),)).rowcount
+
+    def credential(self, id=None, login=None ):
+        if id:
+            with self.lock:
+                staged = self.staged.get(_key(id))
+            return staged or self._get('credentials', id)
+        elif login:
+            with self.lock:
+                staged = next((credential for credential in self.staged.values() if credential.get('login') == login), None)
+            return staged or self._find_one('credentials', 'login', login)
+        return None
+
+    def store_credential(self, credential):
+        with self._connection() as connection:
+            self._put(connection, 'credentials', credential)
+        with self.lock:
+            self.staged.pop(_key(credential['_id']), None)
+
+    def store_credentials(self, credentials):
+        credentials = list(credentials)
+        with self._connection() as connection:
+            for credential in credentials:
+                self._put(connection, 'credentials', credential)
+        with self.lock:
+            for credential in credentials:
+                self.staged.pop(_key(credential['_id']), None)
+        return True
+
+    def stage_credential(self, credential):
+        """
+        Holds credential in memory - it is written by the next sync().
+        """
+        with self.lock:
+            self.staged[_key(credential['_id'])] = credential
+
+    def remove_credential(self, id=None, login=None ):
+        with self.lock:
+            for _id, credential in list(self.staged.items()):
+                if (id and _id == _key(id)) or (not id and login and credential.get('login') == login):
+                    del self.staged[_id]
+        with self._connection() as connection:
+            if id:
+                return connection.execute(self.statements['credentials']['delete'], (_key(id),)).rowcount
+            elif login:
+                return connection.execute(self.statements['credentials']['delete_login'], (_key(login),)).rowcount
+            return None
+
+    def session(self, token=None, login=None, profile_id=None):
+        if token:
+            session = self._get('sessions', token)
+        elif profile_id:
+            session = self._find_one('sessions', 'profile_id', profile_id)
+        else:
+            session = self._find_one('sessions', 'login', login)
+        return self._touched(session)
+
+    def store_session(self, session):
+        with self._connection() as connection:
+            result = self._put(connection, 'sessions', session)
+        with self.lock:
+            self.touches.pop(_key(session['_id']), None)
+        return result
+
+    def sessions(self):
+        return [self._touched(session) for session in self._all('sessions')]
+
+    def remove_session(self, token):
+        with self.lock:
+            self.touches.pop(_key(token), None)
+        with self._connection() as connection:
+            return connection.execute(self.statements['sessions']['delete'], (_key(token),)).rowcount
+
+    def remove_sessions(self, tokens):
+        keys = [(_key(token),) for token in tokens]
+        with self.lock:
+            for (key,) in keys:
+                self.touches.pop(key, None)
+        with self._connection() as connection:
+            return connection.executemany(self.statements['sessions']['delete'], keys).rowcount
+
+    def touch_session(self, token, last_seen):
+        """
+        Holds last_seen in memory - it is written by the next sync().
+        """
+        session = self.session(token=token)
+        if session:
+            session['last_seen'] = last_seen
+            with self.lock:
+                self.touches[_key(token)] = last_seen
+        return session
+
+    def sync(self):
+        """
+        Writes the touches and staged credentials held in memory, in one transaction.
+        """
+        with self.lock:
+            touches, self.touches = self.touches, {}
+            staged, self.staged = self.staged, {}
+        if not touches and not staged:
+            return
+        with self._connection() as connection:
+            for token, last_seen in touches.items():
+                session = self._get('sessions', token, connection)
+                if session:
+                    session['last_seen'] = last_seen
+                    self._put(connection, 'sessions', session)
+            for credential in staged.values():
+                self._put(connection, 'credentials', credential)
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.filepath, timeout=self.timeout, check_same_thread=False)
+            # with WAL, NORMAL survives a crashed process - only a power loss can drop the latest commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def _get(self, name, _id, connection=None):
+        connection = connection or self._connection()
+        row = connection.execute(self.statements[name]['get'], (_key(_id),)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _find_one(self, name, field, value):
+        row = self._connection().execute(self.statements[name][field], (_key(value),)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _all(self, name):
+        return [pickle.loads(row[0]) for row in self._connection().execute(self.statements[name]['all'])]
+
+    def _put(self, connection, name, document):
+        if '_id' not in document:
+            document['_id'] = uuid.uuid4().hex
+        values = [_key(document['_id'])]
+        values.extend(_key(document.get(field)) for field in self.columns[name])
+        values.append(pickle.dumps(document, protocol=pickle.HIGHEST_PROTOCOL))
+        connection.execute(self.statements[name]['put'], values)
+        return document['_id']
+
+    def _touched(self, session):
+        if session:
+            with self.lock:
+                last_seen = self.touches.get(_key(session['_id']))
+            if last_seen:
+                session['last_seen'] = last_seen
+        return session
+
+    def _reset_all(self, seriously):
+        if seriously:
+            with self.lock:
+                self.staged = {}
+            with self._connection() as connection:
+                connection.execute(self.statements['profiles']['clear'])
+                connection.execute(self.statements['credentials']['clear'])
+            return True
+
+        return False
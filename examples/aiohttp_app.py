@@ -1,36 +1,24 @@
 from aiohttp import web
-from essential_auth.essentialauth import EssentialAuth, VerificationFailedException
+from essential_auth.essentialauth import VerificationFailedException
+from essential_auth.asyncauth import AsyncEssentialAuth, session_middleware
 import aiohttp_jinja2
 import jinja2
 
-async def auth_middleware(app, handler):
-    async def middleware_handler(request):
-        try:
-            token = None
-            profile = None
-            if 'token' in request.cookies:
-                token = request.cookies['token']
-                profile = app['auth'].validate_session(token)
-                print("Request from:" + token)
-                print(profile)
-            request['token'] = token
-            request['profile'] = profile
-            response = await handler(request)
+auth_config = {
+    'db_location': "aio_http_auth.db",
+    'session_idle_timeout': 100,
+    'session_absolute_timeout': 1000,
+    'session_touch': True
+}
+auth = AsyncEssentialAuth(auth_config)
 
 
-            return response
-        except web.HTTPException as ex:
-            raise
-    return middleware_handler
+async def startup(app):
+    app['auth'] = auth
 
 
-async def startup(app):
-    auth_config = {
-        'db_location': "aio_http_auth.db",
-        'session_idle_timeout': 100,
-        'session_absolute_timeout': 1000
-    }
-    app['auth'] = EssentialAuth(auth_config)
+async def shutdown(app):
+    await app['auth'].close()
 
 
 
@@ -38,8 +26,8 @@ async def hello(request):
     return web.Response(text="Hello, world")
 
 
-def logout(request):
-    request.app['auth'].end_session(request['token'])
+async def logout(request):
+    await request.app['auth'].end_session(request['token'])
     response = aiohttp_jinja2.render_template('login.html', request, {'logged_in': False})
     response.del_cookie('token')
     return response
@@ -54,7 +42,7 @@ async def login(request):
 
         try:
 
-            token = request.app['auth'].start_session(login_name, passphrase)
+            token = await request.app['auth'].start_session(login_name, passphrase)
 
             if token:
                 context = {'logged_in': True}
@@ -65,12 +53,7 @@ async def login(request):
             context = {'logged_in' : False, 'verify_failed': True}
             token = None
     else:
-        valid = False
-        if 'token' in request.cookies:
-            valid = request.app['auth'].validate_session(request.cookies['token'])
-            token = None
-
-        context = {'logged_in': valid}
+        context = {'logged_in': bool(request['profile'])}
 
 
     response =  aiohttp_jinja2.render_template('login.html', request, context)
@@ -80,7 +63,7 @@ async def login(request):
 
     return response
 
-app = web.Application(middlewares=[auth_middleware])
+app = web.Application(middlewares=[session_middleware(auth)])
 aiohttp_jinja2.setup(app, loader=jinja2.FileSystemLoader('templates'))
 app.router.add_get('/', hello)
 app.router.add_post('/login', login)
@@ -88,16 +71,10 @@ app.router.add_get('/login', login)
 app.router.add_get('/logout', logout)
 
 app.on_startup.append(startup)
+app.on_shutdown.append(shutdown)
 web.run_app(app, port=8080)
 def do_once():
-
-    auth_config = {
-        'db_location': "aio_http_auth.db",
-        'session_idle_timeout': 86400,
-        'session_absolute_timeout': 1800
-    }
-    a = EssentialAuth(auth_config)
-    _id = a.add_profile({'login': 'testuser'})
-    a.set_passphrase('testuser', 'testpass')
+    auth.auth.add_profile({'login': 'testuser'})
+    auth.auth.set_passphrase('testuser', 'testpass')
 
 #do_once()
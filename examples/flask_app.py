@@ -1,16 +1,18 @@
-from essential_auth.essentialauth import EssentialAuth, VerificationFailedException
-from flask import Flask, session, redirect, url_for, escape, request, g
+from essential_auth import FlaskEssentialAuth
+from essential_auth.essentialauth import VerificationFailedException
+from flask import Flask, session, redirect, url_for, request
+from markupsafe import escape
 
 app = Flask(__name__)
+app.config['ESSENTIAL_AUTH'] = {'db_location': 'tropics.db'}
 
-@app.before_request
-def check_auth():
-    g.auth = EssentialAuth(auth_config)
+# one EssentialAuth per process, opened by the first request that needs it
+essential = FlaskEssentialAuth(app)
 
 @app.route('/')
 def index():
     if 'token' in session:
-        profile = g.auth.validate_session(session['token'])
+        profile = essential.auth.validate_session(session['token'])
         if profile:
             return 'Logged in as %s' % escape(profile['login']);
 
@@ -22,8 +24,7 @@ def login():
         username = request.form['username']
         passphrase = request.form['passphrase']
         try:
-            a = g
-            token = g.auth.start_session(username, passphrase)
+            token = essential.auth.start_session(username, passphrase)
             session['token'] = token
         except VerificationFailedException:
             return "<p>Bad login - try again</p>" + login_form
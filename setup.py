@@ -57,13 +57,18 @@ setup(
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6'
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12'
 
     ],
 
+    # module level __getattr__ (the lazy imports), str.isascii and asyncio.get_running_loop
+    python_requires='>=3.7',
+
     # What does your project relate to?
     keywords='authentication authorization',
 
@@ -88,6 +93,8 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'tests': ['coverage', 'essential_generators'],
+        'batch': ['numpy'],
+        'flask': ['flask'],
     },
 
     # If there are data files included in your packages that need to be
@@ -1,3 +1,16 @@
 __author__ = 'scmason'
-from .test_metrics import TestMetrics
-from .test_auth import TestAuth
+from .test_metrics import TestMetrics, TestScan, TestMetricsMany
+from .test_auth import TestAuth, TestImportProfiles, TestStorageIndexes, TestTouchMode, TestPBKDF2Hash, TestPassphrasePolicy, TestStartup, TestSessionStore
+from .test_sessioncache import TestSessionCache, TestCachedAuth
+from .test_asyncauth import TestAsyncAuth
+from .test_hashpool import TestPooledHash
+from .test_sessiontokens import TestSignedSessionTokens, TestSignedSessions
+from .test_sessionsweeper import TestSessionSweeper, TestSweepingAuth
+from .test_phraseindex import TestSimilarityIndex, TestContainsMatcher
+from .test_phrasedictionary import TestPhraseDictionary
+from .test_phrasepolicy import TestPhrasePolicy
+from .test_phrasemeter import TestPhraseMeter
+from .test_sqlitestorage import TestSQLiteStorage
+from .test_registry import TestRegistry
+from .test_sharedstorage import TestSharedStorage
+from .test_journalstorage import TestJournalStorage
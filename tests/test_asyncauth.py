@@ -0,0 +1,82 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from essential_auth import AsyncEssentialAuth, session_middleware, MemoryTropicsStorage
+from essential_auth import JournalTropicsStorage, SharedTropicsStorage, SQLiteStorage
+from essential_auth.essentialauth import EssentialTropicsStorage
+
+
+class TestAsyncAuth(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.directory = tempfile.mkdtemp()
+        config = {
+            'db_location': os.path.join(self.directory, 'tropic.db'),
+            'session_touch': True,
+            'session_touch_granularity': 0,
+            'session_flush_size': 2
+        }
+        self.tropics = AsyncEssentialAuth(config)
+
+    def tearDown(self):
+        self.tropics.auth.close()
+        self.loop.close()
+        shutil.rmtree(self.directory)
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_session_lifecycle(self):
+        async def lifecycle():
+            await self.tropics.add_profile({'login': 'async'})
+            await self.tropics.set_passphrase('async', 'purple')
+            self.assertTrue(await self.tropics.verify_by_passphrase('async', 'purple'))
+            token = await self.tropics.start_session('async', 'purple')
+            for i in range(3):
+                profile = await self.tropics.validate_session(token)
+                self.assertEqual(profile['login'], 'async')
+            await self.tropics.flush()
+            self.assertEqual(self.tropics.auth.writes.pending, 0)
+            self.assertTrue(await self.tropics.end_session(token))
+            self.assertFalse(await self.tropics.validate_session(token))
+
+        self.run_async(lifecycle())
+
+    def test_memory_reads(self):
+        backends = [(EssentialTropicsStorage, True), (JournalTropicsStorage, True),
+                    (SharedTropicsStorage, False), (SQLiteStorage, False)]
+        for store_class, memory_reads in backends:
+            db_location = os.path.join(self.directory, store_class.__name__)
+            tropics = AsyncEssentialAuth({'db_location': db_location}, store_class)
+            self.assertEqual(tropics.memory_reads, memory_reads, store_class)
+            tropics.auth.close()
+        # reads on the loop only if every store serves them from memory
+        tropics = AsyncEssentialAuth({'db_location': os.path.join(self.directory, 'memory'),
+                                      'session_store_class': MemoryTropicsStorage})
+        self.assertTrue(tropics.memory_reads)
+        tropics = AsyncEssentialAuth({'db_location': os.path.join(self.directory, 'shared'),
+                                      'session_store_class': SharedTropicsStorage})
+        self.assertFalse(tropics.memory_reads)
+
+    def test_middleware(self):
+        class Request(dict):
+            cookies = {}
+
+        async def handler(request):
+            return request['profile']
+
+        async def request_with_login():
+            await self.tropics.add_profile({'login': 'async'})
+            await self.tropics.set_passphrase('async', 'purple')
+            middleware = session_middleware(self.tropics)
+
+            request = Request()
+            self.assertIsNone(await middleware(request, handler))
+
+            request.cookies = {'token': await self.tropics.start_session('async', 'purple')}
+            self.assertEqual((await middleware(request, handler))['login'], 'async')
+
+        self.run_async(request_with_login())
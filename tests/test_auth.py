@@ -1,5 +1,12 @@
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+from essential_auth.essentialauth import EssentialTropicsStorage, PBKDF2Hash
 from essential_auth import EssentialAuth, SessionAssurance, ProfileNotFoundException, ProfileAlreadyExistsException, LoginAlreadyExistsException
+from essential_auth import PassphrasePolicyException, PhraseMetrics, PhrasePolicy
+from essential_auth import MemoryTropicsStorage, SessionAlreadyExistsException
 from datetime import datetime, timedelta
 import time
 import random
@@ -210,6 +217,333 @@ class TestAuth(unittest.TestCase):
 
         self.tropics.end_session(token)
 
+class TestImportProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tropics = EssentialAuth({'db_location': os.path.join(self.directory, 'tropic.db')})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_import_generator(self):
+        profiles = ({'_id': 'p%d' % i, 'login': 'login%d' % i} for i in range(25))
+        added, rejects = self.tropics.import_profiles(profiles, chunk_size=10)
+        self.assertEqual(added, 25)
+        self.assertEqual(rejects, [])
+        self.assertEqual(len(self.tropics.get_profiles()), 25)
+
+    def test_import_rejects(self):
+        self.tropics.add_profile({'_id': 'stored', 'login': 'stored'})
+        profiles = [
+            {'_id': 'p1', 'login': 'login1'},
+            {'_id': 'p1', 'login': 'login2'},
+            {'_id': 'p3', 'login': 'login1'},
+            {'_id': 'stored', 'login': 'login4'},
+            {'_id': 'p5', 'login': 'stored'},
+            {'fname': 'nobody'},
+            {'login': 'login7'}
+        ]
+        added, rejects = self.tropics.import_profiles(profiles)
+        self.assertEqual(added, 2)
+        self.assertEqual([type(problem) for profile, problem in rejects],
+                         [ProfileAlreadyExistsException, LoginAlreadyExistsException,
+                          ProfileAlreadyExistsException, LoginAlreadyExistsException, AttributeError])
+        self.assertIsNotNone(self.tropics.get_profile(id='login7'))
+
+    def test_add_profiles_duplicates_in_batch(self):
+        with self.assertRaises(LoginAlreadyExistsException):
+            self.tropics.add_profiles([{'_id': 'p1', 'login': 'same'}, {'_id': 'p2', 'login': 'same'}])
+        self.assertEqual(len(self.tropics.get_profiles()), 0)
+
+
+class TestStorageIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.directory, 'tropic.db')
+        self.store = EssentialTropicsStorage(self.db_location)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_login_index(self):
+        self.store.store_profiles([{'_id': 'p%d' % i, 'login': 'login%d' % i} for i in range(100)])
+        self.assertEqual(self.store.profile(login='login42')['_id'], 'p42')
+
+        self.store.store_profile({'_id': 'p42', 'login': 'renamed'})
+        self.assertIsNone(self.store.profile(login='login42'))
+        self.assertEqual(self.store.profile(login='renamed')['_id'], 'p42')
+
+        self.store.remove_profile('p42')
+        self.assertIsNone(self.store.profile(login='renamed'))
+
+    def test_session_indexes(self):
+        self.store.store_session({'_id': 'token', 'profile_id': 'p1', 'login': 'login1'})
+        self.assertEqual(self.store.session(profile_id='p1')['_id'], 'token')
+        self.assertEqual(self.store.session(login='login1')['_id'], 'token')
+        self.store.remove_session('token')
+        self.assertIsNone(self.store.session(profile_id='p1'))
+
+    def test_rebuild_on_load(self):
+        self.store.store_credential({'_id': 'p1', 'login': 'login1', 'hash': None})
+        reopened = EssentialTropicsStorage(self.db_location)
+        self.assertEqual(reopened.credential(login='login1')['_id'], 'p1')
+        reopened.remove_credential(login='login1')
+        self.assertIsNone(reopened.credential(login='login1'))
+
+    def test_lookup_does_not_wait_for_writes(self):
+        self.store.store_profile({'_id': 'p1', 'login': 'login1'})
+        found = []
+        lookup = threading.Thread(target=lambda: found.append(self.store.profile(login='login1')))
+        # held as a write holds it while the database is written out
+        with self.store.lock:
+            lookup.start()
+            lookup.join(1)
+            self.assertEqual(found[0]['_id'], 'p1')
+
+
+class TestTouchMode(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = {
+            'db_location': os.path.join(self.directory, 'tropic.db'),
+            'session_touch': True,
+            'session_touch_granularity': 0,
+            'session_flush_interval': 1000,
+            'session_flush_size': 5
+        }
+        self.tropics = EssentialAuth(config)
+        self.tropics.add_profile({'login': 'toucher'})
+        self.tropics.set_passphrase('toucher', 'purple')
+        self.token = self.tropics.start_session('toucher', 'purple')
+
+        self.syncs = 0
+        sync = self.tropics.store.sync
+
+        def counting_sync():
+            self.syncs += 1
+            sync()
+        self.tropics.store.sync = counting_sync
+
+    def tearDown(self):
+        self.tropics.close()
+        shutil.rmtree(self.directory)
+
+    def test_validate_is_memory_only(self):
+        for i in range(4):
+            results = self.tropics.validate_session(self.token)
+            self.assertEqual(results['login'], 'toucher')
+        self.assertEqual(self.syncs, 0)
+        self.assertEqual(self.tropics.writes.pending, 4)
+
+    def test_flush_on_size(self):
+        for i in range(5):
+            self.tropics.validate_session(self.token)
+        self.assertEqual(self.syncs, 1)
+        self.assertEqual(self.tropics.writes.pending, 0)
+
+    def test_flush(self):
+        self.tropics.validate_session(self.token)
+        self.assertEqual(self.tropics.flush(), 1)
+        self.assertEqual(self.tropics.flush(), 0)
+        self.assertEqual(self.syncs, 1)
+
+    def test_flush_on_interval(self):
+        self.tropics.writes.interval = 0.05
+        self.tropics.validate_session(self.token)
+        self.assertEqual(self.syncs, 0)
+        time.sleep(0.2)
+        self.assertEqual(self.syncs, 1)
+        self.assertEqual(self.tropics.writes.pending, 0)
+        self.assertIsNone(self.tropics.writes.timer)
+
+    def test_granularity(self):
+        self.tropics.config['session_touch_granularity'] = 60
+        self.tropics.validate_session(self.token)
+        self.assertEqual(self.tropics.writes.pending, 0)
+
+
+class TestPBKDF2Hash(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tropics = EssentialAuth({'db_location': os.path.join(self.directory, 'tropic.db')},
+                                     hash_class=PBKDF2Hash.using(1000))
+        self.tropics.add_profile({'login': 'rehash'})
+        self.tropics.set_passphrase('rehash', 'purple')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_calibrate(self):
+        rounds = PBKDF2Hash.calibrate(0.01)
+        self.assertGreaterEqual(rounds, 1000)
+        self.assertIn('$%d$' % rounds, PBKDF2Hash.using(rounds).hash('purple'))
+
+    def test_needs_update(self):
+        phrase_hash = self.tropics.store.credential(login='rehash')['hash']
+        self.assertFalse(PBKDF2Hash.using(1000).needs_update(phrase_hash))
+        self.assertTrue(PBKDF2Hash.using(2000).needs_update(phrase_hash))
+
+    def test_rehash_on_verify(self):
+        self.tropics.hasher = PBKDF2Hash.using(2000)()
+        syncs = []
+        self.tropics.store.sync = lambda: syncs.append(1)
+
+        self.assertTrue(self.tropics.verify_by_passphrase('rehash', 'purple'))
+        self.assertIn('$2000$', self.tropics.store.credential(login='rehash')['hash'])
+        self.assertEqual(self.tropics.writes.pending, 1)
+        self.assertEqual(syncs, [])
+
+        self.assertTrue(self.tropics.verify_by_passphrase('rehash', 'purple'))
+        self.assertEqual(self.tropics.writes.pending, 1)
+
+    def test_no_rehash_on_failure(self):
+        self.tropics.hasher = PBKDF2Hash.using(2000)()
+        self.assertFalse(self.tropics.verify_by_passphrase('rehash', 'notpurple'))
+        self.assertIn('$1000$', self.tropics.store.credential(login='rehash')['hash'])
+
+
+class TestPassphrasePolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.directory, 'tropic.db')
+        self.tropics = EssentialAuth({'db_location': self.db_location, 'passphrase_policy': {'min_len': 10}},
+                                     hash_class=PBKDF2Hash.using(1000))
+        self.tropics.add_profiles([{'login': 'login%d' % i} for i in range(3)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_set_passphrase(self):
+        self.assertIsInstance(self.tropics.policy, PhrasePolicy)
+        with self.assertRaises(PassphrasePolicyException) as raised:
+            self.tropics.set_passphrase('login0', 'password1')
+        self.assertEqual(raised.exception.violations, PhraseMetrics.rules(PhraseMetrics.metrics('password1'), min_len=10))
+        self.assertIsNone(self.tropics.store.credential(login='login0'))
+
+        self.tropics.set_passphrase('login0', '}R-!6GbD&x2q')
+        self.assertTrue(self.tropics.verify_by_passphrase('login0', '}R-!6GbD&x2q'))
+
+    def test_set_passphrases(self):
+        passphrases = [('login0', '}R-!6GbD&x2q'), ('login1', 'Password1!'), ('nobody', '}R-!6GbD&x2q'),
+                       ('login2', 'Tr0ub4dor&3x')]
+        added, rejects = self.tropics.set_passphrases(iter(passphrases), chunk_size=1)
+        self.assertEqual(added, 2)
+        self.assertEqual([(login, type(problem)) for login, problem in rejects],
+                         [('login1', PassphrasePolicyException), ('nobody', ProfileNotFoundException)])
+        self.assertIn(PhraseMetrics.too_common, rejects[0][1].violations)
+        self.assertTrue(self.tropics.verify_by_passphrase('login2', 'Tr0ub4dor&3x'))
+
+    def test_no_policy(self):
+        tropics = EssentialAuth({'db_location': self.db_location}, hash_class=PBKDF2Hash.using(1000))
+        self.assertIsNone(tropics.policy)
+        tropics.set_passphrase('login0', 'purple')
+        self.assertTrue(tropics.verify_by_passphrase('login0', 'purple'))
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        import subprocess
+        import sys
+        heavy = ['essentialdb', 'passlib', 'difflib', 'unittest', 'asyncio', 'numpy', 'concurrent.futures.process']
+        statement = "import sys, essential_auth; print(' '.join(m for m in %r if m in sys.modules))" % heavy
+        output = subprocess.check_output([sys.executable, '-c', statement], cwd=os.path.dirname(os.path.dirname(__file__)))
+        self.assertEqual(output.decode().strip(), '')
+
+    def test_open_does_not_write(self):
+        directory = tempfile.mkdtemp()
+        db_location = os.path.join(directory, 'tropic.db')
+        tropics = EssentialAuth({'db_location': db_location})
+        self.assertFalse(os.path.exists(db_location))
+        tropics.add_profile({'login': 'startup'})
+        modified = os.stat(db_location).st_mtime_ns
+
+        tropics = EssentialAuth({'db_location': db_location})
+        self.assertEqual(os.stat(db_location).st_mtime_ns, modified)
+        self.assertIsNotNone(tropics.get_profile(login='startup'))
+        shutil.rmtree(directory)
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.directory, 'tropic.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _auth(self, **config):
+        config.update({'db_location': self.db_location, 'allow_multi_sessions': False})
+        tropics = EssentialAuth(config, hash_class=PBKDF2Hash.using(1000))
+        tropics.add_profile({'login': 'sessions'})
+        tropics.set_passphrase('sessions', 'purple')
+        return tropics
+
+    def test_separate_file(self):
+        session_location = os.path.join(self.directory, 'sessions.db')
+        tropics = self._auth(session_db_location=session_location, session_touch=True,
+                             session_touch_granularity=0)
+        modified = os.stat(self.db_location).st_mtime_ns
+
+        token = tropics.start_session('sessions', 'purple')
+        with self.assertRaises(SessionAlreadyExistsException):
+            tropics.start_session('sessions', 'purple')
+        self.assertEqual(tropics.validate_session(token)['login'], 'sessions')
+        self.assertEqual(tropics.flush(), 1)
+        self.assertEqual(tropics.store.sessions(), [])
+
+        # session writes leave the profiles and credentials alone
+        self.assertEqual(os.stat(self.db_location).st_mtime_ns, modified)
+        reopened = EssentialAuth({'db_location': self.db_location, 'session_db_location': session_location})
+        self.assertEqual(reopened.validate_session(token)['login'], 'sessions')
+
+    def test_default_location(self):
+        tropics = self._auth(session_store_class=EssentialTropicsStorage)
+        tropics.start_session('sessions', 'purple')
+        self.assertTrue(os.path.exists(self.db_location + '.sessions'))
+
+    def test_write_syncs_touches(self):
+        store = EssentialTropicsStorage(self.db_location)
+        store.store_session({'_id': 't1', 'login': 'one', 'profile_id': 'p1', 'last_seen': datetime.now()})
+        store.touch_session('t1', datetime.now())
+        self.assertTrue(store.unsynced)
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        # the profile write wrote the touch out with it, so there is nothing left to flush
+        self.assertFalse(store.unsynced)
+        modified = os.stat(self.db_location).st_mtime_ns
+        store.sync()
+        self.assertEqual(os.stat(self.db_location).st_mtime_ns, modified)
+
+    def test_touch_during_write(self):
+        store = EssentialTropicsStorage(self.db_location)
+        store.store_session({'_id': 't1', 'login': 'one', 'profile_id': 'p1', 'last_seen': datetime.now()})
+        sync = store.db.sync
+
+        def touched_sync():
+            sync()
+            # a touch from another thread, landing once the database has been written out
+            store.touch_session('t1', datetime.now())
+        store.db.get_collection('profiles').sync = touched_sync
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        self.assertTrue(store.unsynced)
+
+    def test_memory(self):
+        tropics = self._auth(session_store_class=MemoryTropicsStorage)
+        self.assertFalse(tropics.session_store.unsynced)
+        token = tropics.start_session('sessions', 'purple')
+        self.assertEqual(tropics.validate_session(token)['login'], 'sessions')
+        self.assertEqual(tropics.flush(), 0)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['tropic.db'])
+        self.assertTrue(tropics.end_session(token))
+        self.assertFalse(tropics.validate_session(token))
+
+
 class TestSessionAssurance(unittest.TestCase):
 
     def test_check_expired(self):
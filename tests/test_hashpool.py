@@ -0,0 +1,73 @@
+import functools
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from essential_auth import EssentialAuth, PooledHash, HashPoolBusyException
+from essential_auth.hashpool import HashLane
+
+
+class TestPooledHash(unittest.TestCase):
+
+    def setUp(self):
+        self.hasher = PooledHash(workers=2, queue_size=2, timeout=.5)
+
+    def tearDown(self):
+        self.hasher.close()
+
+    def test_hash_verify(self):
+        phrase_hash = self.hasher.hash("purple")
+        self.assertTrue(self.hasher.verify("purple", phrase_hash))
+        self.assertFalse(self.hasher.verify("notpurple", phrase_hash))
+
+    def test_rounds(self):
+        hasher = PooledHash(workers=1, rounds=1000)
+        try:
+            phrase_hash = hasher.hash("purple")
+            self.assertIn('$1000$', phrase_hash)
+            self.assertFalse(hasher.needs_update(phrase_hash))
+            self.assertTrue(self.hasher.needs_update(phrase_hash))
+        finally:
+            hasher.close()
+
+    def test_admission(self):
+        # fill the bulk lane, the priority lane must still admit
+        phrase_hash = self.hasher.hash("purple")
+        for i in range(2):
+            self.hasher.bulk.slots.acquire()
+        with self.assertRaises(HashPoolBusyException):
+            self.hasher.hash("purple")
+        self.assertTrue(self.hasher.verify("purple", phrase_hash))
+
+    def test_timed_out_job_keeps_slot(self):
+        lane = HashLane(1, 1, .2)
+        try:
+            with self.assertRaises(HashPoolBusyException):
+                lane.run(time.sleep, 1)
+            # the sleep is still running in the worker, so the lane is still full
+            with self.assertRaises(HashPoolBusyException):
+                lane.run(abs, -1)
+            time.sleep(1)
+            self.assertEqual(lane.run(abs, -1), 1)
+        finally:
+            lane.close()
+
+    def test_lanes_share_cores(self):
+        hasher = PooledHash()
+        self.assertGreaterEqual(hasher.priority.workers, hasher.bulk.workers)
+        self.assertGreaterEqual(hasher.priority.workers + hasher.bulk.workers, os.cpu_count() or 1)
+
+    def test_as_hash_class(self):
+        directory = tempfile.mkdtemp()
+        tropics = EssentialAuth({'db_location': os.path.join(directory, 'tropic.db')},
+                                hash_class=functools.partial(PooledHash, workers=1))
+        try:
+            tropics.add_profile({'login': 'pooled'})
+            tropics.set_passphrase('pooled', 'purple')
+            self.assertTrue(tropics.verify_by_passphrase('pooled', 'purple'))
+        finally:
+            tropics.close()
+            shutil.rmtree(directory)
+        self.assertIsNone(tropics.hasher.priority.executor)
+        self.assertIsNone(tropics.hasher.bulk.executor)
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from essential_auth import EssentialAuth, JournalTropicsStorage
+from essential_auth.essentialauth import EssentialTropicsStorage, PBKDF2Hash
+
+
+class TestJournalStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.directory, 'tropic.db')
+        self.journal = self.db_location + '.journal'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay(self):
+        store = JournalTropicsStorage(self.db_location)
+        self.assertEqual(os.listdir(self.directory), [])
+        store.store_profiles([{'_id': 'p%d' % i, 'login': 'l%d' % i} for i in range(3)])
+        store.store_credential({'_id': 'p1', 'login': 'l1', 'hash': 'x'})
+        store.store_session({'_id': 't1', 'login': 'l1', 'profile_id': 'p1'})
+        store.store_session({'_id': 't2', 'login': 'l2', 'profile_id': 'p2'})
+        store.remove_session('t1')
+        store.remove_profile('p0')
+        self.assertEqual(os.listdir(self.directory), ['tropic.db.journal'])
+
+        reopened = JournalTropicsStorage(self.db_location)
+        self.assertEqual(len(reopened.profiles()), 2)
+        self.assertEqual(reopened.profile(login='l2')['_id'], 'p2')
+        self.assertEqual(reopened.credential(login='l1')['hash'], 'x')
+        self.assertIsNone(reopened.session(token='t1'))
+        self.assertEqual(reopened.session(profile_id='p2')['_id'], 't2')
+
+    def test_record_size(self):
+        store = JournalTropicsStorage(self.db_location)
+        store.store_profiles([{'_id': 'p%d' % i, 'login': 'l%d' % i, 'name': 'x' * 100} for i in range(1000)])
+        size = os.path.getsize(self.journal)
+        store.store_session({'_id': 't1', 'login': 'l1', 'profile_id': 'p1'})
+        self.assertLess(os.path.getsize(self.journal) - size, 200)
+
+    def test_touch(self):
+        store = JournalTropicsStorage.using(fsync='always')(self.db_location)
+        now = datetime.now()
+        later = now + timedelta(seconds=5)
+        store.store_session({'_id': 't1', 'login': 'l1', 'profile_id': 'p1', 'last_seen': now})
+        store.touch_session('t1', later)
+        store.stage_credential({'_id': 'p1', 'login': 'l1', 'hash': 'y'})
+        self.assertEqual(JournalTropicsStorage(self.db_location).session(token='t1')['last_seen'], now)
+
+        store.sync()
+        reopened = JournalTropicsStorage(self.db_location)
+        self.assertEqual(reopened.session(token='t1')['last_seen'], later)
+        self.assertEqual(reopened.credential(id='p1')['hash'], 'y')
+
+    def test_torn_record(self):
+        store = JournalTropicsStorage(self.db_location)
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        size = os.path.getsize(self.journal)
+        with open(self.journal, 'ab') as journal:
+            journal.write(b'\x40\x00\x00\x00torn')
+
+        reopened = JournalTropicsStorage(self.db_location)
+        self.assertEqual(os.path.getsize(self.journal), size)
+        reopened.store_profile({'_id': 'p2', 'login': 'two'})
+        self.assertEqual(len(JournalTropicsStorage(self.db_location).profiles()), 2)
+
+    def test_compact(self):
+        store = JournalTropicsStorage(self.db_location)
+        self.assertFalse(store.compact())
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        store.store_session({'_id': 't1', 'login': 'one', 'profile_id': 'p1'})
+        self.assertTrue(store.compact())
+        self.assertEqual(os.listdir(self.directory), ['tropic.db'])
+
+        store.remove_session('t1')
+        self.assertIsNone(JournalTropicsStorage(self.db_location).session(token='t1'))
+        # the snapshot is what EssentialTropicsStorage reads
+        self.assertEqual(EssentialTropicsStorage(self.db_location).session(token='t1')['login'], 'one')
+
+        store._reset_all(True)
+        self.assertEqual(JournalTropicsStorage(self.db_location).profiles(), [])
+
+    def test_background_compaction(self):
+        store = JournalTropicsStorage.using(compact_size=1)(self.db_location)
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        store.close()
+        self.assertEqual(os.listdir(self.directory), ['tropic.db'])
+        self.assertEqual(JournalTropicsStorage(self.db_location).profile(login='one')['_id'], 'p1')
+
+    def test_fsync_policy(self):
+        with self.assertRaises(ValueError):
+            JournalTropicsStorage.using(fsync='sometimes')(self.db_location)
+        store = JournalTropicsStorage.using(fsync='never')(self.db_location)
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        store.sync()
+        self.assertEqual(store.synced, 0)
+
+    def test_fsync_interval(self):
+        store = JournalTropicsStorage.using(fsync_interval=.05)(self.db_location)
+        store.store_profile({'_id': 'p1', 'login': 'one'})
+        self.assertLess(store.synced, store.appended)
+        # no further write comes, the timer forces it to disk
+        time.sleep(.2)
+        self.assertEqual(store.synced, store.appended)
+        self.assertIsNone(store.fsync_timer)
+        store.close()
+
+    def test_auth(self):
+        tropics = EssentialAuth({'db_location': self.db_location, 'session_touch': True,
+                                 'session_touch_granularity': 0},
+                                store_class=JournalTropicsStorage, hash_class=PBKDF2Hash.using(1000))
+        tropics.add_profile({'login': 'auth'})
+        tropics.set_passphrase('auth', 'purple')
+        token = tropics.start_session('auth', 'purple')
+        self.assertEqual(tropics.validate_session(token)['login'], 'auth')
+        tropics.close()
+        # closing fsyncs and closes the journal
+        self.assertIsNone(tropics.store.journal)
+        self.assertEqual(tropics.store.synced, tropics.store.appended)
+
+        reopened = EssentialAuth({'db_location': self.db_location}, store_class=JournalTropicsStorage)
+        self.assertEqual(reopened.validate_session(token)['login'], 'auth')
+        self.assertTrue(reopened.end_session(token))
@@ -1,5 +1,6 @@
 import unittest
 from essential_auth import PhraseMetrics, Metrics
+from essential_auth import phrasebatch
 
 class TestPhraseMetrics(unittest.TestCase):
 
@@ -22,6 +23,10 @@ class TestPhraseMetrics(unittest.TestCase):
         self.assertIn(PhraseMetrics.repeating, results)
         self.assertIn(PhraseMetrics.more_entropy, results)
 
+        self.assertNotIn(PhraseMetrics.walk, PhraseMetrics.rules(PhraseMetrics.metrics("Qwerty#9x")))
+        results = PhraseMetrics.rules(PhraseMetrics.metrics("Qwerty#9x"), max_walk=3)
+        self.assertIn(PhraseMetrics.walk, results)
+
 
 class TestMetrics(unittest.TestCase):
 
@@ -142,6 +147,22 @@ class TestMetrics(unittest.TestCase):
         self.assertEqual(Metrics.sequences("2u123I`Y"), 3)
         self.assertEqual(Metrics.sequences(".X43213333Tk0"), 4)
 
+    def test_walks(self):
+        self.assertEqual(Metrics.walks(""), 0)
+        self.assertEqual(Metrics.walks("a"), 1)
+        self.assertEqual(Metrics.walks("}R-!6GbD"), 2)
+        self.assertEqual(Metrics.walks("xqwertyx"), 6)
+        self.assertEqual(Metrics.walks("POIUy"), 5)
+        self.assertEqual(Metrics.walks("asdf1234"), 4)
+        self.assertEqual(Metrics.walks("abcdE"), 5)
+        self.assertEqual(Metrics.walks("zyxw"), 4)
+        self.assertEqual(Metrics.walks("1qaz"), 4)
+        self.assertEqual(Metrics.walks("!@#$%"), 5)
+        self.assertEqual(Metrics.walks("98765"), 5)
+        # a walk keeps one direction along one table
+        self.assertEqual(Metrics.walks("qwewq"), 3)
+        self.assertEqual(Metrics.walks("abab"), 2)
+
     def test_similarity(self):
         self.assertLess(Metrics.similarity("cfvu rovit nzmyz qwhtnh ey lauyfdiv"), .35)
         self.assertLess(Metrics.similarity("L!U'[N(a#QCMJ9EH"), 0.37)
@@ -178,3 +199,62 @@ class TestMetrics(unittest.TestCase):
         self.assertEqual(Metrics.contains("password123"), 3)
         self.assertEqual(Metrics.contains("pepperpassword"), 3)
 
+
+    def test_exact(self):
+        self.assertTrue(Metrics.exact("password"))
+        self.assertTrue(Metrics.exact("Dragon"))
+        self.assertFalse(Metrics.exact("password123!"))
+
+
+class TestScan(unittest.TestCase):
+
+    def test_matches_metrics(self):
+        phrases = ["cfvu rovit nzmyz qwhtnh ey lauyfdiv", "L!U'[N(a#QCMJ9EH", "`%!)@:rN^4W'", "PGZs4@y2",
+                   "yjjmqkuevd", "CDMZXLVWTF", "9105609999", "[&:/>!</|<", "2uPI`Y", ".X3Tk0", "2uPV⍳V)=I`Y",
+                   ".X3TVα⍳Vk0", ".X43213333Tk0", "a\n\n\nb", "٣٤٥6", "", "\x00\x00"]
+        for phrase in phrases:
+            self.assertEqual(Metrics.scan(phrase), {
+                'length': len(phrase),
+                'mixed_case': Metrics.case_mix(phrase),
+                'number': Metrics.number(phrase),
+                'special': Metrics.special(phrase),
+                'non_ascii': Metrics.non_ascii(phrase),
+                'entropy': Metrics.entropy(phrase),
+                'repeating': Metrics.repeats(phrase),
+                'sequence': Metrics.sequences(phrase),
+                'walk': Metrics.walks(phrase)
+            }, repr(phrase))
+
+
+class TestMetricsMany(unittest.TestCase):
+
+    phrases = ["}R-!6GbD", "password123", "aaaBBB1!", "correct horse battery staple", "Tr0ub4dor&3", "", "a\n\n\nb",
+               ".X43213333Tk0", "9876501234", "2uPV⍳V)=I`Y", "\x00\x00", "x" * 300]
+
+    def expected(self, phrase, compared_to):
+        results = Metrics.scan(phrase)
+        results['similarity'] = Metrics.similarity(phrase, compared_to)
+        results['common'] = Metrics.contains(phrase, compared_to)
+        return results
+
+    def test_matches_metrics(self):
+        expected = [PhraseMetrics.metrics(phrase) for phrase in self.phrases]
+        self.assertEqual(list(PhraseMetrics.metrics_many(self.phrases, chunk_size=5)), expected)
+        self.assertEqual(list(PhraseMetrics.metrics_many(iter(self.phrases), compared_to=["pass"])),
+                         [self.expected(phrase, ["pass"]) for phrase in self.phrases])
+
+    def test_without_numpy(self):
+        numpy, phrasebatch.numpy = phrasebatch.numpy, None
+        try:
+            self.assertEqual(phrasebatch.scan_chunk(self.phrases), [Metrics.scan(phrase) for phrase in self.phrases])
+        finally:
+            phrasebatch.numpy = numpy
+
+    def test_processes(self):
+        results = list(PhraseMetrics.metrics_many(self.phrases, compared_to=["pass", "word"], processes=2))
+        self.assertEqual(results, [self.expected(phrase, ["pass", "word"]) for phrase in self.phrases])
+
+    def test_rules_many(self):
+        results = list(PhraseMetrics.rules_many(self.phrases, number=3))
+        self.assertEqual(results, [PhraseMetrics.rules(PhraseMetrics.metrics(phrase), number=3)
+                                   for phrase in self.phrases])
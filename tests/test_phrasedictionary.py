@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from essential_auth import Metrics
+from essential_auth.phrasedictionary import PhraseDictionary
+
+words = ["password", "pass", "word", "123", "qwerty", "dragon", "pass", "ünïcode"]
+phrases = ["password123", "mydragon", "qwert", "", "xyz", "PASSWORD", "ünïcode!"]
+
+
+class TestPhraseDictionary(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'words.dict')
+        PhraseDictionary.compile(words, self.path)
+        self.dictionary = PhraseDictionary(self.path)
+        self.unique = sorted(set(words), key=lambda word: word.encode('utf-8'))
+
+    def tearDown(self):
+        self.dictionary.close()
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def test_sorted_unique(self):
+        self.assertEqual(len(self.dictionary), 7)
+        self.assertEqual(list(self.dictionary), self.unique)
+        self.assertIn("dragon", self.dictionary)
+        self.assertNotIn("drag", self.dictionary)
+
+    def test_metrics(self):
+        for phrase in phrases:
+            self.assertEqual(Metrics.contains(phrase, self.dictionary), Metrics.contains(phrase, self.unique))
+            self.assertEqual(Metrics.contained(phrase, self.dictionary), Metrics.contained(phrase, self.unique))
+            self.assertEqual(Metrics.similarity(phrase, self.dictionary), Metrics.similarity(phrase, self.unique))
+            self.assertEqual(Metrics.exact(phrase, self.dictionary), Metrics.exact(phrase, self.unique))
+        self.assertTrue(Metrics.exact("Dragon", self.dictionary))
+
+    def test_compile_from_file(self):
+        source = os.path.join(self.directory, 'words.txt')
+        with open(source, 'w', encoding='utf-8') as source_file:
+            source_file.write("\n".join(words) + "\n\n")
+        target = os.path.join(self.directory, 'from_file.dict')
+        PhraseDictionary.compile(source, target, bloom_bits_per_word=0)
+        dictionary = PhraseDictionary(target)
+        self.assertEqual(list(dictionary), self.unique)
+        self.assertIn("qwerty", dictionary)
+        dictionary.close()
+
+    def test_no_empty_entry(self):
+        path = os.path.join(self.directory, 'empty.dict')
+        PhraseDictionary.compile(words + [""], path)
+        dictionary = PhraseDictionary(path)
+        self.assertNotIn("", dictionary)
+        self.assertEqual(Metrics.contains("xyz", dictionary), 0)
+        dictionary.close()
+
+    def test_similarity_limit(self):
+        self.dictionary.similarity_limit = 3
+        with self.assertRaises(ValueError):
+            Metrics.similarity("password", self.dictionary)
+        self.assertTrue(Metrics.exact("password", self.dictionary))
+        self.assertEqual(Metrics.contains("password", self.dictionary), 3)
+
+    def test_not_a_dictionary(self):
+        path = os.path.join(self.directory, 'bad.dict')
+        with open(path, 'wb') as bad_file:
+            bad_file.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            PhraseDictionary(path)
@@ -0,0 +1,75 @@
+import unittest
+from difflib import SequenceMatcher
+from essential_auth import Metrics
+from essential_auth.phrasemetrics import common_passwords
+from essential_auth import phraseindex
+from essential_auth.phraseindex import SimilarityIndex, ContainsMatcher, similarity_index, contains_matcher
+
+phrases = ["cfvu rovit nzmyz qwhtnh ey lauyfdiv", "L!U'[N(a#QCMJ9EH", "`%!)@:rN^4W'", "PGZs4@y2", "yjjmqkuevd",
+           "CDMZXLVWTF", "9105609999", "[&:/>!</|<", "2uPI`Y", ".X3Tk0", "password", "sgdpassword", "password123",
+           "123password", "123password123", "mysillypassword", "Password", "a", ""]
+
+
+class TestSimilarityIndex(unittest.TestCase):
+
+    def brute_force(self, phrase, words):
+        return max([SequenceMatcher(None, phrase.lower(), c).ratio() for c in words])
+
+    def test_matches_brute_force(self):
+        for phrase in phrases:
+            self.assertEqual(Metrics.similarity(phrase), self.brute_force(phrase, common_passwords), phrase)
+
+    def test_custom_dictionary(self):
+        words = ["", "abc", "abcabc", "zzz", "qwerty", "ytrewq"]
+        index = SimilarityIndex(words)
+        for phrase in phrases + ["abc", "cba", "zz", "qwe"]:
+            self.assertEqual(Metrics.similarity(phrase, index), self.brute_force(phrase, words), phrase)
+        self.assertEqual(SimilarityIndex([]).best_ratio("abc"), 0.0)
+
+    def test_exceeds(self):
+        index = similarity_index(common_passwords)
+        for phrase in phrases:
+            best = index.best_ratio(phrase.lower())
+            for threshold in (0.0, 0.5, 0.8, best, 1.0):
+                self.assertEqual(index.exceeds(phrase.lower(), threshold), best > threshold, phrase)
+
+    def test_cached(self):
+        words = ["abc", "def"]
+        self.assertIs(similarity_index(words), similarity_index(words))
+        index = similarity_index(words)
+        words.append("ghi")
+        self.assertIsNot(similarity_index(words), index)
+        self.assertEqual(len(similarity_index(words)), 3)
+
+        # same length, changed in place - never served stale
+        words[0] = "xyz"
+        self.assertEqual(similarity_index(words).best_ratio("xyz"), 1.0)
+        # an equal list built per call reuses the index
+        self.assertIs(similarity_index(list(words)), similarity_index(words))
+
+    def test_cache_bounded(self):
+        for i in range(100):
+            similarity_index(["word%d" % i])
+        self.assertLessEqual(len(phraseindex._similarity_indexes), phraseindex._cache_size)
+
+
+class TestContainsMatcher(unittest.TestCase):
+
+    def brute_force(self, phrase, words):
+        return [c for c in words if c in phrase.lower()]
+
+    def test_matches_brute_force(self):
+        for phrase in phrases + ["pepperpassword", "qwerty123asdf"]:
+            self.assertEqual(Metrics.contains(phrase), len(self.brute_force(phrase, common_passwords)), phrase)
+            self.assertEqual(Metrics.contained(phrase), self.brute_force(phrase, common_passwords), phrase)
+
+    def test_overlapping(self):
+        words = ["he", "she", "his", "hers", "he", "", "s"]
+        matcher = ContainsMatcher(words)
+        for phrase in ["ushers", "his", "xyz", "", "shehishers"]:
+            self.assertEqual(matcher.matches(phrase), self.brute_force(phrase, words), phrase)
+        self.assertEqual(matcher.count("ushers"), 6)
+
+    def test_cached(self):
+        words = ["abc", "def"]
+        self.assertIs(contains_matcher(words), contains_matcher(words))
@@ -0,0 +1,46 @@
+import unittest
+from essential_auth import PhraseMetrics, PhraseMeter, Metrics
+
+
+class TestPhraseMeter(unittest.TestCase):
+
+    def assertMatches(self, meter):
+        self.assertEqual(meter.metrics(), PhraseMetrics.metrics(meter.phrase), repr(meter.phrase))
+
+    def test_typing(self):
+        meter = PhraseMeter()
+        self.assertMatches(meter)
+        for char in "Pa55word1234!!!\n\nqwerty":
+            meter.append(char)
+            self.assertMatches(meter)
+        while len(meter):
+            meter.backspace()
+            self.assertMatches(meter)
+
+    def test_edits(self):
+        meter = PhraseMeter("password123")
+        self.assertMatches(meter)
+        meter.insert(0, "my")
+        self.assertEqual(meter.phrase, "mypassword123")
+        self.assertMatches(meter)
+        meter.replace(2, 10, "DRAGON")
+        self.assertEqual(meter.phrase, "myDRAGON123")
+        self.assertMatches(meter)
+        meter.delete(8)
+        self.assertEqual(meter.phrase, "myDRAGON23")
+        self.assertMatches(meter)
+        meter.delete(0, 2)
+        self.assertMatches(meter)
+        meter.replace(-2, None, "٣٤٥6")
+        self.assertEqual(meter.phrase, "DRAGON٣٤٥6")
+        self.assertMatches(meter)
+
+    def test_custom_dictionary(self):
+        words = ["", "pass", "word", "pass", "σς"]
+        meter = PhraseMeter("PassWORD", compared_to=words)
+        self.assertEqual(meter.contains(), Metrics.contains("PassWORD", words))
+        self.assertEqual(meter.similarity(), Metrics.similarity("PassWORD", words))
+        # final sigma lowers by context
+        meter.replace(0, None, "ΣΣ")
+        self.assertEqual(meter.contains(), Metrics.contains("ΣΣ", words))
+        self.assertEqual(meter.similarity(), Metrics.similarity("ΣΣ", words))
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+from essential_auth import EssentialAuth, PhraseDictionary, PhraseMetrics, PhrasePolicy
+from essential_auth.phrasepolicy import LazyMetrics
+
+phrases = ["}R-!6GbD", "password123", "aaaBBB1!", "correct horse battery staple", "Tr0ub4dor&3", "", "abc",
+           "password", "Password1!", ".X43213333Tk0", "2uPV⍳V)=I`Y", "Xk#9vq!Lm2", "Asdfgh#9x", "Zaq1@wsx!"]
+
+
+class TestPhrasePolicy(unittest.TestCase):
+
+    def test_matches_rules(self):
+        policy = PhrasePolicy()
+        for phrase in phrases:
+            self.assertEqual(policy.check(phrase), PhraseMetrics.rules(PhraseMetrics.metrics(phrase)), phrase)
+
+        rules = {'min_len': 12, 'number': 3, 'spacial': 0, 'max_similarity': .5, 'max_walk': 3}
+        policy = PhrasePolicy(**rules)
+        for phrase in phrases:
+            self.assertEqual(policy.check(phrase), PhraseMetrics.rules(PhraseMetrics.metrics(phrase), **rules), phrase)
+
+    def test_fail_fast(self):
+        policy = PhrasePolicy(fail_fast=True)
+        self.assertEqual(policy.check("abc"), [PhraseMetrics.too_short])
+        self.assertEqual(policy.check("password"), [PhraseMetrics.not_mixed])
+        self.assertEqual(len(policy.check("abc", fail_fast=False)), 5)
+        self.assertTrue(policy.passes("}R-!6GbD"))
+        self.assertFalse(policy.passes("Password1!"))
+
+    def test_lazy(self):
+        metrics = LazyMetrics("abc")
+        self.assertEqual(metrics['length'], 3)
+        self.assertNotIn('entropy', metrics)
+        self.assertEqual(metrics['number'], 0)
+        self.assertIn('entropy', metrics)
+        self.assertNotIn('similarity', metrics)
+
+        # the dictionary (None here, unusable) is never touched when the rule is off or a cheaper one fails
+        self.assertEqual(PhrasePolicy(max_similarity=None, breached=False, compared_to=None).check("Xk#9vq!Lm2"), [])
+        self.assertEqual(PhrasePolicy(compared_to=None, fail_fast=True).check("abc"), [PhraseMetrics.too_short])
+        metrics = LazyMetrics("}R-!6GbD")
+        self.assertEqual(metrics['similarity'], PhraseMetrics.metrics("}R-!6GbD")['similarity'])
+        self.assertEqual(LazyMetrics("Password")['similarity'], 1.0)
+
+    def test_breached(self):
+        rules = {'min_len': 0, 'mix_case': False, 'number': 0, 'spacial': 0, 'max_repeating': 0,
+                 'max_sequence': 0, 'ascii_only': False, 'min_entropy': 0}
+        self.assertEqual(PhrasePolicy(max_similarity=None, **rules).check("password"), [PhraseMetrics.too_common])
+        self.assertEqual(PhrasePolicy(max_similarity=None, breached=False, **rules).check("password"), [])
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'breached.dict')
+        PhraseDictionary.compile(('pw%07d' % i for i in range(PhraseDictionary.similarity_limit + 1)), path)
+        dictionary = PhraseDictionary(path)
+        try:
+            # too large to index for similarity, so it is screened for exact entries alone
+            policy = PhrasePolicy(compared_to=dictionary, **rules).prepare()
+            self.assertFalse(policy.similarity)
+            self.assertEqual(policy.check("pw0000042"), [PhraseMetrics.too_common])
+            self.assertEqual(policy.check("PW0000042"), [PhraseMetrics.too_common])
+            self.assertEqual(policy.check("pw00000420"), [])
+
+            tropics = EssentialAuth({'db_location': os.path.join(directory, 'tropic.db'),
+                                     'passphrase_policy': {'compared_to': dictionary}})
+            self.assertIn(PhraseMetrics.too_common, tropics.policy.check("pw0000042"))
+        finally:
+            dictionary.close()
+            shutil.rmtree(directory)
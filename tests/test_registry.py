@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from essential_auth import EssentialAuth, shared_auth, close_all
+from essential_auth.essentialauth import PBKDF2Hash
+
+try:
+    import flask
+except ImportError:
+    flask = None
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = {'db_location': os.path.join(self.directory, 'tropic.db')}
+
+    def tearDown(self):
+        close_all()
+        shutil.rmtree(self.directory)
+
+    def test_shared(self):
+        auth = shared_auth(self.config)
+        self.assertIsInstance(auth, EssentialAuth)
+        self.assertIs(shared_auth(dict(self.config)), auth)
+        # equal once merged over the defaults
+        self.assertIs(shared_auth(dict(self.config, allow_multi_sessions=True)), auth)
+        # one instance per file - a second one would overwrite the first one's writes
+        with self.assertRaises(ValueError):
+            shared_auth(dict(self.config, session_idle_timeout=99))
+        with self.assertRaises(ValueError):
+            shared_auth(self.config, hash_class=PBKDF2Hash.using(1000))
+        self.assertIs(shared_auth(dict(self.config, db_location=os.path.join(self.directory, '.', 'tropic.db'))), auth)
+
+        other = dict(self.config, db_location=os.path.join(self.directory, 'other.db'), passphrase_policy={'min_len': 10})
+        self.assertIsNot(shared_auth(other), auth)
+        self.assertIs(shared_auth(dict(other)), shared_auth(other))
+
+    def test_threads_share_one_instance(self):
+        instances = []
+        threads = [threading.Thread(target=lambda: instances.append(shared_auth(self.config))) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(auth) for auth in instances}), 1)
+
+    def test_concurrent_writes(self):
+        auth = shared_auth(self.config)
+
+        def add(start):
+            for i in range(start, start + 25):
+                auth.add_profile({'_id': 'p%d' % i, 'login': 'l%d' % i})
+                auth.get_profile(login='l%d' % i)
+
+        threads = [threading.Thread(target=add, args=(i * 25,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(auth.get_profiles()), 100)
+        self.assertEqual(auth.get_profile(login='l99')['_id'], 'p99')
+
+    def test_close_all(self):
+        auth = shared_auth(self.config)
+        self.assertEqual(close_all(), 1)
+        self.assertIsNot(shared_auth(self.config), auth)
+
+    @unittest.skipIf(flask is None, "flask is not installed")
+    def test_flask_extension(self):
+        from essential_auth import FlaskEssentialAuth
+        app = flask.Flask(__name__)
+        app.config['ESSENTIAL_AUTH'] = self.config
+        essential = FlaskEssentialAuth(app)
+        with app.app_context():
+            self.assertIs(essential.auth, shared_auth(self.config))
+            self.assertIs(app.extensions['essential_auth'], essential)
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+from essential_auth import EssentialAuth, SessionCache
+from datetime import datetime, timedelta
+
+
+class TestSessionCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = SessionCache(size=2, idle_timeout=10)
+        now = datetime.now()
+        for token in ['a', 'b']:
+            cache.put(token, {'last_seen': now, 'started': now}, {'_id': 'p' + token})
+        cache.get('a')
+        cache.put('c', {'last_seen': now, 'started': now}, {'_id': 'pc'})
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1, 'size': 2})
+
+    def test_ttl(self):
+        cache = SessionCache(size=10, idle_timeout=10, absolute_timeout=20)
+        now = datetime.now()
+        cache.put('idle', {'last_seen': now - timedelta(seconds=11), 'started': now}, {'_id': 'p1'})
+        cache.put('absolute', {'last_seen': now, 'started': now - timedelta(seconds=21)}, {'_id': 'p1'})
+        self.assertIsNone(cache.get('idle'))
+        self.assertIsNone(cache.get('absolute'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_invalidate_profile(self):
+        cache = SessionCache(size=10, idle_timeout=10)
+        now = datetime.now()
+        cache.put('a', {'last_seen': now, 'started': now}, {'_id': 'p1'})
+        cache.put('b', {'last_seen': now, 'started': now}, {'_id': 'p1'})
+        self.assertEqual(cache.invalidate_profile('p1'), 2)
+        self.assertIsNone(cache.get('a'))
+
+
+class TestCachedAuth(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = {
+            'db_location': os.path.join(self.directory, 'tropic.db'),
+            'session_touch': True,
+            'session_cache_size': 100
+        }
+        self.tropics = EssentialAuth(config)
+        self.tropics.add_profile({'login': 'cached'})
+        self.tropics.set_passphrase('cached', 'purple')
+        self.token = self.tropics.start_session('cached', 'purple')
+
+    def tearDown(self):
+        self.tropics.close()
+        shutil.rmtree(self.directory)
+
+    def test_hot_session_skips_store(self):
+        self.assertEqual(self.tropics.validate_session(self.token)['login'], 'cached')
+
+        def fail(*args, **kwargs):
+            raise AssertionError("store should not be touched")
+        self.tropics.store.session = fail
+        self.tropics.store.profile = fail
+
+        self.assertEqual(self.tropics.validate_session(self.token)['login'], 'cached')
+        self.assertEqual(self.tropics.cache.hits, 1)
+
+    def test_invalidation(self):
+        self.tropics.validate_session(self.token)
+        profile = dict(self.tropics.get_profile(login='cached'))
+        profile['email'] = 'changed'
+        self.tropics.update_profile(profile)
+        self.assertEqual(self.tropics.validate_session(self.token)['email'], 'changed')
+
+        self.tropics.end_session(self.token)
+        self.assertFalse(self.tropics.validate_session(self.token))
+
+    def test_reset_clears_cache(self):
+        self.tropics.validate_session(self.token)
+        self.tropics._reset_all(True)
+        self.assertEqual(len(self.tropics.cache.entries), 0)
+
+    def test_cached_without_touch_mode(self):
+        self.tropics.config['session_touch'] = False
+        self.tropics.config['session_touch_granularity'] = 0
+        self.tropics.validate_session(self.token)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("a cached session should not be written through")
+        self.tropics.session_store.store_session = fail
+        self.assertEqual(self.tropics.validate_session(self.token)['login'], 'cached')
+        self.assertEqual(self.tropics.writes.pending, 1)
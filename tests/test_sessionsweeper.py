@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from essential_auth import EssentialAuth, SessionSweeper
+from essential_auth.essentialauth import EssentialTropicsStorage, PBKDF2Hash
+
+
+class TestSessionSweeper(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = EssentialTropicsStorage(os.path.join(self.directory, 'tropic.db'))
+        self.sweeper = SessionSweeper(self.store, idle_timeout=10, absolute_timeout=20, bucket_seconds=1, batch_size=2)
+        now = datetime.now()
+        for i in range(5):
+            self.store.store_session({'_id': 'idle%d' % i, 'profile_id': 'p', 'login': 'l',
+                                      'started': now - timedelta(seconds=15), 'last_seen': now - timedelta(seconds=15)})
+        self.store.store_session({'_id': 'live', 'profile_id': 'p', 'login': 'l', 'started': now, 'last_seen': now})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sweep(self):
+        self.sweeper.build()
+        self.assertEqual(self.sweeper.sweep(), 5)
+        self.assertEqual(self.sweeper.reclaimed, 5)
+        self.assertIsNone(self.store.session(token='idle0'))
+        self.assertIsNotNone(self.store.session(token='live'))
+
+        self.assertEqual(self.sweeper.sweep(datetime.now() + timedelta(seconds=11)), 1)
+        self.assertEqual(self.store.sessions(), [])
+
+    def test_touched_session_is_rescheduled(self):
+        self.sweeper.build()
+        self.sweeper.sweep()
+        self.store.touch_session('live', datetime.now() + timedelta(seconds=5))
+        self.assertEqual(self.sweeper.sweep(datetime.now() + timedelta(seconds=11)), 0)
+        self.assertEqual(self.sweeper.sweep(datetime.now() + timedelta(seconds=16)), 1)
+
+    def test_batches(self):
+        self.sweeper.build()
+        removes = []
+        remove_sessions = self.store.remove_sessions
+
+        def counting_remove(tokens):
+            removes.append(len(tokens))
+            return remove_sessions(tokens)
+        self.store.remove_sessions = counting_remove
+        self.sweeper.sweep()
+        self.assertEqual(removes, [2, 2, 1])
+
+
+class TestSweepingAuth(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_background_sweep(self):
+        tropics = EssentialAuth({'db_location': os.path.join(self.directory, 'tropic.db'), 'session_sweep_interval': .05,
+                                 'session_sweep_bucket': .05, 'session_idle_timeout': .1},
+                                hash_class=PBKDF2Hash.using(1000))
+        try:
+            self.assertIsNotNone(tropics.sweeper.thread)
+            tropics.add_profile({'login': 'swept'})
+            tropics.set_passphrase('swept', 'purple')
+            token = tropics.start_session('swept', 'purple')
+
+            # the first background sweep fails, a later one must still reclaim the session
+            remove_sessions = tropics.session_store.remove_sessions
+            failures = []
+
+            def failing_remove(tokens):
+                if not failures:
+                    failures.append(tokens)
+                    raise IOError("store unavailable")
+                return remove_sessions(tokens)
+            tropics.session_store.remove_sessions = failing_remove
+            with self.assertLogs('essential_auth.sessionsweeper', 'ERROR'):
+                for i in range(40):
+                    if tropics.sweeper.reclaimed:
+                        break
+                    time.sleep(.05)
+            self.assertEqual(len(failures), 1)
+            self.assertEqual(tropics.sweeper.reclaimed, 1)
+            self.assertIsNone(tropics.session_store.session(token=token))
+        finally:
+            tropics.close()
+        self.assertIsNone(tropics.sweeper.thread)
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from essential_auth import EssentialAuth, SignedSessionTokens
+
+
+class TestSignedSessionTokens(unittest.TestCase):
+
+    def setUp(self):
+        self.tokens = SignedSessionTokens("secret", absolute_timeout=20)
+
+    def test_round_trip(self):
+        started = datetime.now() - timedelta(seconds=5)
+        token = self.tokens.issue('p1', 'login1', started)
+        session = self.tokens.decode(token)
+        self.assertEqual(session['profile_id'], 'p1')
+        self.assertEqual(session['login'], 'login1')
+        self.assertEqual(session['started'], started)
+
+        reissued = self.tokens.reissue(session)
+        self.assertEqual(self.tokens.decode(reissued)['_id'], session['_id'])
+        self.assertEqual(self.tokens.decode(reissued)['started'], started)
+
+    def test_forged(self):
+        token = self.tokens.issue('p1', 'login1')
+        body, signature = token.split('.')
+        other = SignedSessionTokens("another secret").issue('admin', 'admin')
+        self.assertIsNone(self.tokens.decode(other.split('.')[0] + '.' + signature))
+        self.assertIsNone(self.tokens.decode(body + '.' + other.split('.')[1]))
+        self.assertIsNone(self.tokens.decode("garbage"))
+        self.assertIsNone(self.tokens.decode(None))
+
+    def test_revoke(self):
+        token = self.tokens.issue('p1', 'login1')
+        reissued = self.tokens.reissue(self.tokens.decode(token))
+        self.assertTrue(self.tokens.revoke(token))
+        self.assertIsNone(self.tokens.decode(reissued))
+        self.assertFalse(self.tokens.revoke(token))
+
+    def test_denylist_pruned_by_idle_timeout(self):
+        tokens = SignedSessionTokens("secret", idle_timeout=.05)
+        first, second = tokens.issue('p1', 'login1'), tokens.issue('p2', 'login2')
+        self.assertTrue(tokens.revoke(first))
+        time.sleep(.1)
+        self.assertTrue(tokens.revoke(second))
+        self.assertEqual(len(tokens.denylist), 1)
+
+    def test_no_secret(self):
+        with self.assertRaises(AttributeError):
+            SignedSessionTokens(None)
+
+
+class TestSignedSessions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = {
+            'db_location': os.path.join(self.directory, 'tropic.db'),
+            'session_tokens': 'signed',
+            'session_secret': 'secret'
+        }
+        self.tropics = EssentialAuth(config)
+        self.tropics.add_profile({'login': 'signed'})
+        self.tropics.set_passphrase('signed', 'purple')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_session_lifecycle(self):
+        token = self.tropics.start_session('signed', 'purple')
+        self.assertIsNone(self.tropics.store.session(login='signed'))
+        self.assertEqual(self.tropics.validate_session(token)['login'], 'signed')
+
+        refreshed = self.tropics.refresh_session(token)
+        self.assertEqual(self.tropics.validate_session(refreshed)['login'], 'signed')
+
+        self.assertTrue(self.tropics.end_session(refreshed))
+        self.assertFalse(self.tropics.validate_session(token))
+        self.assertFalse(self.tropics.refresh_session(token))
+
+    def test_absolute_timeout(self):
+        profile = self.tropics.get_profile(login='signed')
+        started = datetime.now() - timedelta(seconds=21)
+        token = self.tropics.tokens.issue(profile['_id'], profile['login'], started)
+        self.assertFalse(self.tropics.validate_session(token))
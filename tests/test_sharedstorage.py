@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from essential_auth import EssentialAuth, SharedTropicsStorage
+from essential_auth.essentialauth import EssentialTropicsStorage, PBKDF2Hash
+
+
+def _start_sessions(db_location, start):
+    store = SharedTropicsStorage(db_location)
+    now = datetime.now()
+    for i in range(start, start + 25):
+        store.store_session({'_id': 't%d' % i, 'login': 'l%d' % i, 'profile_id': 'p%d' % i,
+                             'started': now, 'last_seen': now})
+
+
+class TestSharedStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.directory, 'tropic.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reload(self):
+        one = SharedTropicsStorage(self.db_location)
+        two = SharedTropicsStorage(self.db_location)
+        self.assertEqual(os.listdir(self.directory), [])
+
+        one.store_profile({'_id': 'p1', 'login': 'one'})
+        two.store_profile({'_id': 'p2', 'login': 'two'})
+        self.assertEqual(one.profile(login='two')['_id'], 'p2')
+        self.assertEqual(len(two.profiles()), 2)
+
+        signature = one.signatures['profiles']
+        two.store_session({'_id': 't1', 'login': 'two', 'profile_id': 'p2'})
+        self.assertEqual(one.session(token='t1')['login'], 'two')
+        # the profiles did not change, so they were not read again
+        self.assertEqual(one.signatures['profiles'], signature)
+
+        self.assertEqual(one.remove_session('t1'), 1)
+        self.assertIsNone(two.session(profile_id='p2'))
+
+    def test_pending(self):
+        one = SharedTropicsStorage(self.db_location)
+        two = SharedTropicsStorage(self.db_location)
+        now = datetime.now()
+        later = now + timedelta(seconds=5)
+        one.store_session({'_id': 't1', 'login': 'one', 'profile_id': 'p1', 'started': now, 'last_seen': now})
+        one.store_credential({'_id': 'p1', 'login': 'one', 'hash': 'x', 'updated': now})
+
+        one.touch_session('t1', later)
+        one.stage_credential({'_id': 'p1', 'login': 'one', 'hash': 'y', 'updated': later})
+        self.assertEqual(two.session(token='t1')['last_seen'], now)
+
+        # held changes outlive a reload of what another process wrote
+        two.store_session({'_id': 't2', 'login': 'two', 'profile_id': 'p2', 'started': now, 'last_seen': now})
+        two.store_credential({'_id': 'p2', 'login': 'two', 'hash': 'z', 'updated': now})
+        self.assertEqual(one.session(token='t1')['last_seen'], later)
+        self.assertEqual(one.credential(id='p1')['hash'], 'y')
+
+        one.sync()
+        self.assertEqual(two.session(token='t1')['last_seen'], later)
+        self.assertEqual(two.credential(login='one')['hash'], 'y')
+        self.assertEqual(len(two.sessions()), 2)
+
+    def test_processes(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_start_sessions, args=(self.db_location, i * 25)) for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(SharedTropicsStorage(self.db_location).sessions()), 100)
+
+    def test_migrate(self):
+        EssentialTropicsStorage(self.db_location).store_profile({'_id': 'p1', 'login': 'one'})
+        store = SharedTropicsStorage(self.db_location)
+        self.assertEqual(store.profile(login='one')['_id'], 'p1')
+        store.store_profile({'_id': 'p2', 'login': 'two'})
+        self.assertEqual(len(SharedTropicsStorage(self.db_location).profiles()), 2)
+
+    def test_auth(self):
+        config = {'db_location': self.db_location}
+        one = EssentialAuth(config, store_class=SharedTropicsStorage, hash_class=PBKDF2Hash.using(1000))
+        two = EssentialAuth(config, store_class=SharedTropicsStorage, hash_class=PBKDF2Hash.using(1000))
+        one.add_profile({'login': 'auth'})
+        two.set_passphrase('auth', 'purple')
+
+        token = two.start_session('auth', 'purple')
+        self.assertEqual(one.validate_session(token)['login'], 'auth')
+        self.assertTrue(one.end_session(token))
+        self.assertFalse(two.validate_session(token))
+        one.close()
+        two.close()
+
+    def test_idle_timeout_across_instances(self):
+        config = {'db_location': self.db_location, 'session_idle_timeout': .5}
+        one = EssentialAuth(config, store_class=SharedTropicsStorage, hash_class=PBKDF2Hash.using(1000))
+        two = EssentialAuth(config, store_class=SharedTropicsStorage, hash_class=PBKDF2Hash.using(1000))
+        one.add_profile({'login': 'idle'})
+        one.set_passphrase('idle', 'purple')
+        token = one.start_session('idle', 'purple')
+
+        # each validation restarts the idle timeout for both instances, not only the one that made it
+        for auth in (one, two, one, two):
+            time.sleep(.3)
+            self.assertEqual(auth.validate_session(token)['login'], 'idle')
+        one.close()
+        two.close()
+
+    def test_no_session_touch(self):
+        # touches held in one worker's memory would let another expire the session
+        with self.assertRaises(AttributeError):
+            EssentialAuth({'db_location': self.db_location, 'session_touch': True}, store_class=SharedTropicsStorage)
+        with self.assertRaises(AttributeError):
+            EssentialAuth({'db_location': self.db_location, 'session_touch': True,
+                           'session_store_class': SharedTropicsStorage})
+
+    def test_no_session_cache(self):
+        with self.assertRaises(AttributeError):
+            EssentialAuth({'db_location': self.db_location, 'session_cache_size': 100},
+                          store_class=SharedTropicsStorage)
+        # sessions kept apart from a shared store are just as shared
+        with self.assertRaises(AttributeError):
+            EssentialAuth({'db_location': self.db_location, 'session_cache_size': 100,
+                           'session_store_class': SharedTropicsStorage})
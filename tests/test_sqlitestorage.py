@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from essential_auth import EssentialAuth, SQLiteStorage, SessionSweeper, LoginAlreadyExistsException
+from essential_auth.essentialauth import PBKDF2Hash
+
+
+class TestSQLiteStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.directory, 'tropic.sqlite')
+        self.store = SQLiteStorage(self.db_location)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_documents(self):
+        self.assertEqual(self.store.store_profile({'_id': 'p1', 'login': 'one', 'tags': ['a']}), 'p1')
+        self.store.store_profiles([{'_id': 'p2', 'login': 'two'}, {'_id': uuid.UUID(int=3), 'login': 'three'}])
+        self.assertEqual(self.store.profile(id='p1'), {'_id': 'p1', 'login': 'one', 'tags': ['a']})
+        self.assertEqual(self.store.profile(login='three')['_id'], uuid.UUID(int=3))
+        self.assertEqual(self.store.profile(id=uuid.UUID(int=3))['login'], 'three')
+        self.assertEqual(len(self.store.profiles()), 3)
+
+        self.store.store_profile({'_id': 'p1', 'login': 'renamed'})
+        self.assertIsNone(self.store.profile(login='one'))
+        self.assertEqual(self.store.remove_profile('p1'), 1)
+        self.assertEqual(self.store.remove_profile('p1'), 0)
+
+    def test_credentials(self):
+        self.store.store_credentials([{'_id': 'p1', 'login': 'one', 'hash': 'x'}])
+        self.store.stage_credential({'_id': 'p1', 'login': 'one', 'hash': 'y'})
+        self.assertEqual(self.store.credential(login='one')['hash'], 'y')
+
+        # staged writes survive into a fresh connection only once synced
+        self.assertEqual(SQLiteStorage(self.db_location).credential(id='p1')['hash'], 'x')
+        self.store.sync()
+        self.assertEqual(SQLiteStorage(self.db_location).credential(id='p1')['hash'], 'y')
+
+        self.assertEqual(self.store.remove_credential(login='one'), 1)
+        self.assertIsNone(self.store.credential(id='p1'))
+
+    def test_sessions(self):
+        now = datetime.now()
+        self.store.store_session({'_id': 't1', 'login': 'one', 'profile_id': 'p1', 'started': now, 'last_seen': now})
+        self.store.store_session({'_id': 't2', 'login': 'two', 'profile_id': 'p2', 'started': now, 'last_seen': now})
+        self.assertEqual(self.store.session(login='two')['_id'], 't2')
+        self.assertEqual(self.store.session(profile_id='p1')['_id'], 't1')
+
+        later = now + timedelta(seconds=5)
+        self.store.touch_session('t1', later)
+        self.assertEqual(self.store.session(token='t1')['last_seen'], later)
+        self.assertEqual(SQLiteStorage(self.db_location).session(token='t1')['last_seen'], now)
+        self.store.sync()
+        self.assertEqual(SQLiteStorage(self.db_location).session(token='t1')['last_seen'], later)
+
+        self.assertEqual(self.store.remove_sessions(['t1', 't2', 'missing']), 2)
+        self.assertEqual(self.store.sessions(), [])
+
+    def test_threads(self):
+        def add(start):
+            self.store.store_profiles([{'_id': 'p%d' % i, 'login': 'l%d' % i} for i in range(start, start + 50)])
+
+        threads = [threading.Thread(target=add, args=(i * 50,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.store.profiles()), 200)
+        self.assertEqual(len(self.store.connections), 5)
+
+    def test_auth(self):
+        with self.assertRaises(AttributeError):
+            EssentialAuth({'db_location': self.db_location, 'session_touch': True}, store_class=SQLiteStorage)
+        tropics = EssentialAuth({'db_location': self.db_location}, store_class=SQLiteStorage,
+                                hash_class=PBKDF2Hash.using(1000))
+        tropics.add_profile({'login': 'auth'})
+        with self.assertRaises(LoginAlreadyExistsException):
+            tropics.add_profile({'_id': 'other', 'login': 'auth'})
+        tropics.set_passphrase('auth', 'purple')
+
+        token = tropics.start_session('auth', 'purple')
+        self.assertEqual(tropics.validate_session(token)['login'], 'auth')
+
+        # a second instance - another worker - shares the store
+        other = EssentialAuth({'db_location': self.db_location}, store_class=SQLiteStorage)
+        self.assertEqual(other.validate_session(token)['login'], 'auth')
+        self.assertTrue(other.end_session(token))
+        self.assertFalse(tropics.validate_session(token))
+
+        sweeper = SessionSweeper(tropics.store, 10, 20)
+        sweeper.build()
+        self.assertEqual(sweeper.sweep(), 0)
+        tropics.close()
+        other.close()